@@ -1,3 +1,5 @@
+--- @resource: cpu-heavy
+--- @max-parallel: 2
 --- Create test partitioned heap table
 drop table if exists t_row2column;
 create table t_row2column
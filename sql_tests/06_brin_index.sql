@@ -1,3 +1,5 @@
+--- @resource: cpu-heavy
+--- @max-parallel: 2
 ---@sql@ Create test table
 drop table if exists t_brin_index;
 CREATE TABLE t_brin_index
@@ -1,3 +1,4 @@
+--- @verify: off
 ---@sql@ Create test table
 drop table if exists t_update_select;
 create table t_update_select
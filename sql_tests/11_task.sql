@@ -1,3 +1,4 @@
+--- @verify: off
 ---@sql@ Create test table
 drop table if exists t_task;
 CREATE TABLE t_task (message TEXT,time timestamp);
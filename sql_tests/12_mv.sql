@@ -1,3 +1,4 @@
+--- @verify: off
 ---@sql@ Create test table 1
 drop table if exists t_view_1 CASCADE;
 create table t_view_1
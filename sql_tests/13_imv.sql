@@ -1,3 +1,4 @@
+--- @verify: off
 ---@sql@ Create test table 1
 drop table if exists t_incrt_01 CASCADE;
 create table t_incrt_01( id int,
@@ -1,3 +1,6 @@
+--- @verify: off
+--- @resource: cpu-heavy
+--- @max-parallel: 2
 --- Create Pax compression table
 drop table if exists t_pax;
 create table t_pax( id int,
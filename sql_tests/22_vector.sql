@@ -1,3 +1,4 @@
+--- @verify: off
 
 --- Create pgvector extension
 CREATE EXTENSION IF NOT EXISTS vector;
@@ -1,3 +1,4 @@
+--- @verify: off
 create extension if not exists pgcrypto;
 
 -- Symmetric encryption and decryption
@@ -1,3 +1,4 @@
+--- @verify: off
 -- Create anon extension
 CREATE EXTENSION IF NOT EXISTS anon;
 -- Enable anon masking for database testdb
@@ -1,3 +1,4 @@
+--- @exclusive
 --- @sql@ enable parallel
 SET enable_parallel = ON;
 SET optimizer = OFF;
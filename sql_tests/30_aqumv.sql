@@ -1,3 +1,5 @@
+--- @resource: cpu-heavy
+--- @max-parallel: 2
 --- @sql@ enable AQUMV
 set enable_answer_query_using_materialized_views=on; 
 set optimizer=off ;  
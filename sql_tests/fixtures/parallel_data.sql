@@ -0,0 +1,9 @@
+--- Shared dataset of 28_parallel_select.sql: 4M rows, loaded once into a template database
+--- @sql@ create table
+CREATE TABLE t_parallel
+( id int,
+date date,
+amt decimal(10,2)
+ ) DISTRIBUTED BY (id); 
+--- insert data
+insert into t_parallel SELECT id,date, random()*100 as usage FROM generate_series('2024-04-01','2024-04-04',INTERVAL '1 day') as date,  generate_series(1,1000000) id;
@@ -11,12 +11,83 @@ import json
 import argparse
 import subprocess
 import re
+import threading
+import heapq
+import bisect
+import statistics
+import uuid
+import hashlib
+import functools
+import queue
+import time
+import asyncio
+import warnings
+import random
+import math
+import difflib
+import shutil
+import tempfile
+import platform
+from collections import deque, Counter
 from datetime import datetime
-from jinja2 import Environment, FileSystemLoader
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+try:
+    import psycopg2
+except ImportError:  # Only required for '--engine pool'
+    psycopg2 = None
 
 # --- Configuration Constant ---
 REPORT_DIR = "test_report"
+SQL_TIMEOUT_SECONDS = 600
+DEFAULT_CONCURRENCY = 8         # Concurrent SQL sessions; a property of the cluster, not of the client's CPUs
+AUTO_CONCURRENCY_START = 4      # '--concurrency auto': initial limit ...
+AUTO_CONCURRENCY_MAX = 64       # ... default upper bound (--max-concurrency)
+AUTO_CONTROL_INTERVAL = 5.0     # Seconds between controller decisions
+AUTO_DECREASE_FACTOR = 0.7      # Multiplicative decrease on overload
+AUTO_MAX_INFLATION = 2.0        # Median duration / unloaded duration above this means overload
+AUTO_CONNECTION_HEADROOM = 0.9  # Sessions above this share of max_connections means overload
+ASYNC_STREAM_LIMIT = 1 << 20    # Longest output line read in one piece by '--engine async'
+HISTORY_MAX_REPORTS = 20        # Number of most recent JSON reports used for duration history
+DEFAULT_TEST_DURATION = 10.0    # Predicted duration (seconds) for a file without any history
+ADMIN_TIMEOUT_SECONDS = 120     # Timeout for housekeeping statements (isolation setup/cleanup, probes)
+SCHEDULER_OK_STATUSES = ("SUCCESS", "CACHED")  # Statuses that satisfy an @depends annotation
+LOG_FLUSH_INTERVAL = 0.5        # Seconds between batched flushes of the log files
+LOG_BUFFER_BYTES = 1 << 20      # Write buffer per open log file
+LOG_QUEUE_SIZE = 10000          # Pending log lines before writers block (bounds memory)
+OUTPUT_TAIL_LINES = 20          # Last output lines of each test kept in memory for the report
+OUTPUT_ERROR_LINES = 5          # First stderr lines of each test kept in memory for the report
+STATEMENT_TEXT_MAX = 200        # Characters of each statement's text kept in the report
+HISTORY_FILE = "history.jsonl"  # Append-only run history inside REPORT_DIR
+BASELINE_RUNS = 10              # Default number of earlier runs used as baseline
+BASELINE_MIN_SAMPLES = 3        # Fewer earlier samples than this: no regression verdict
+REGRESSION_SIGMA = 3.0          # Slower than median + N standard deviations ...
+REGRESSION_MIN_SLOWDOWN = 0.2   # ... and at least 20% slower than the median ...
+REGRESSION_MIN_DELTA = 0.1      # ... and at least 0.1s slower (ignores jitter on tiny tests)
+EXIT_REGRESSED = 3              # Exit code when '--compare-baseline' finds regressions
+RESULT_CACHE_FILE = "result_cache.json"  # Passing tests by cache key, inside REPORT_DIR ('--changed-only')
+LOAD_DEFAULT_DURATION = 60.0    # Seconds a '--load' run lasts when neither duration nor iterations are given
+LOAD_INTERVAL_SECONDS = 5.0     # Length of the throughput/latency snapshots of a '--load' run
+SERVER_STAT_COUNTERS = ("blks_read", "blks_hit", "temp_files", "temp_bytes", "tup_returned", "tup_fetched",
+                        "tup_inserted", "tup_updated", "tup_deleted", "xact_commit", "xact_rollback")  # '--server-stats'
+SERVER_STATS_TOP = 5            # Tests listed per ranking in the server stats summary
+SERVER_STATS_SETTLE = 0.6       # Seconds between re-reads of a private database's counters; longer than the
+                                # stats collector's PGSTAT_STAT_INTERVAL (500ms), so a read can be as stale as that
+SERVER_STATS_SETTLE_READS = 6   # Re-reads before giving up on counters that keep changing
+ANSWER_DIR = "expected"         # Directory of the answer index inside --sql-dir ('--record-answers' / '--verify-answers')
+ANSWER_INDEX_FILE = "answers.json"
+ANSWER_INDEX_VERSION = 2        # Bumped when answer hashes change; indexes of other versions must be recorded again
+ANSWER_INLINE_LINES = 20        # Statements with at most this many normalized output lines keep them in the index (for diffs)
+ANSWER_DIFF_LINES = 200         # Result rows per statement kept in memory for a mismatch diff
+REPORT_PAGE_SIZE = 500          # Results per HTML page; larger runs get a summary page plus detail pages
+REPORT_TOP_TESTS = 20           # Slowest tests listed on the summary page
+REPORT_FAILED_MAX = 200         # Failing tests listed on the summary page (all of them are on the detail pages)
+REPORT_DURATION_BUCKETS = (0.01, 0.1, 1.0, 10.0, 60.0, 600.0)  # Upper bounds (s) of the duration histogram
+TIMELINE_MAX_SPANS = 400        # Tests drawn per worker in the utilization chart; neighbours are merged beyond that
+BENCH_CONCURRENCY = (1, 4, 16, 64, 256)    # Default concurrency levels of 'test_runner.py bench'
+BENCH_SIZES = (10, 100, 1000, 10000)        # Default suite sizes (files) of 'test_runner.py bench'
+BENCH_TIMEOUT_SECONDS = 3600    # Longest a single benchmark run may take
 # ------------------------------
 
 
@@ -48,19 +119,2204 @@ def _log(message, file_handle=None, is_error=False, is_summary=False):
 # --------------------------------------
 
 
+# --- Streaming Output Capture ---
+class LogWriter:
+    """
+    Background writer for the run log and the per-test output logs.
+    Other threads only enqueue text; a single thread appends it to the files in
+    batches and flushes at most every LOG_FLUSH_INTERVAL seconds. It also records
+    the byte range of every test segment for the log index.
+    """
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._files = {}            # path -> open binary file
+        self._sizes = {}            # path -> bytes in file
+        self._segments = {}         # key -> (path, start offset) of the segment being written
+        self.index = {}             # key -> [{"log_file", "offset", "length"}, ...]
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def open_handle(self, path):
+        """A file-like handle for _log(); the file is truncated first"""
+        self._queue.put(("truncate", path))
+        return _LogHandle(self, path)
+
+    def write(self, path, text):
+        self._queue.put(("write", path, text))
+
+    def begin(self, key, path):
+        """Start a segment (one test execution) in a per-test log"""
+        self._queue.put(("begin", key, path))
+
+    def end(self, key, path):
+        """Finish a segment; the per-test log is closed until the next segment"""
+        self._queue.put(("end", key, path))
+
+    def flush(self):
+        """Block until everything queued so far is on disk"""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait()
+
+    def close(self):
+        self._queue.put(("stop",))
+        self._thread.join()
+
+    def write_index(self, path):
+        """Write the test -> log file/byte range index as JSON"""
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.index, f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            print(f"[LOG ERROR] Failed to write log index {path}: {e}", file=sys.stderr)
+
+    def _file(self, path, mode="ab"):
+        f = self._files.get(path)
+        if f is None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            f = open(path, mode, buffering=LOG_BUFFER_BYTES)
+            self._files[path] = f
+            self._sizes[path] = f.seek(0, os.SEEK_END)
+        return f
+
+    def _flush_all(self):
+        for f in self._files.values():
+            f.flush()
+
+    def _handle(self, item):
+        op = item[0]
+        if op == "write":
+            data = item[2].encode("utf-8", errors="replace")
+            self._file(item[1]).write(data)
+            self._sizes[item[1]] += len(data)
+        elif op == "begin":
+            self._file(item[2])
+            self._segments[item[1]] = (item[2], self._sizes[item[2]])
+        elif op == "end":
+            path, offset = self._segments.pop(item[1], (item[2], 0))
+            self.index.setdefault(item[1], []).append(
+                {"log_file": path, "offset": offset, "length": self._sizes.get(path, 0) - offset})
+            f = self._files.pop(path, None)
+            if f is not None:
+                f.close()  # Keeps the number of open files bounded
+        elif op == "truncate":
+            f = self._files.pop(item[1], None)
+            if f is not None:
+                f.close()
+            self._file(item[1], "wb")
+        elif op == "flush":
+            self._flush_all()
+            item[1].set()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                batch = [self._queue.get(timeout=LOG_FLUSH_INTERVAL)]
+            except queue.Empty:
+                self._flush_all()
+                last_flush = time.monotonic()
+                continue
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                if item[0] == "stop":
+                    for f in self._files.values():
+                        f.close()
+                    self._files = {}
+                    return
+                try:
+                    self._handle(item)
+                except (OSError, ValueError) as e:
+                    print(f"[LOG ERROR] Failed to write log: {e}", file=sys.stderr)
+
+            if time.monotonic() - last_flush >= LOG_FLUSH_INTERVAL:
+                self._flush_all()
+                last_flush = time.monotonic()
+
+
+class _LogHandle:
+    """File-like front end of a LogWriter for one file (flush() is left to the writer)"""
+    def __init__(self, writer, path):
+        self.writer = writer
+        self.path = path
+
+    def write(self, text):
+        self.writer.write(self.path, text)
+
+    def flush(self):
+        pass
+
+
+class _NullLogWriter:
+    """LogWriter stand-in for captures whose output is not kept (only the in-memory tail and errors)"""
+    def write(self, path, text):
+        pass
+
+    def begin(self, key, path):
+        pass
+
+    def end(self, key, path):
+        pass
+
+
+class ResultStream:
+    """
+    Appends every finished result to a JSON Lines file as soon as it arrives (one flushed line
+    each), so a crashed run keeps what it finished and the file can be followed with 'tail -f'.
+    The first line is a header ({"stream": "results", ...}) with the run's start time and target(s);
+    close() adds a trailer ({"stream": "end", ...}) with the number of results, so readers can
+    tell a complete stream from the stream of a run that did not finish.
+    """
+    def __init__(self, path, header):
+        self.path = path
+        self.count = 0  # Results written so far (header and trailer excluded)
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self._file.write(json.dumps(dict(header, stream="results"), ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.write(json.dumps({"stream": "end", "results": self.count, "end_time": str(datetime.now())}) + "\n")
+            self._file.close()
+
+
+def _read_result_stream(path):
+    """
+    (header, results, trailer) of a ResultStream file. The trailer is None when the run did not
+    finish; a torn last line (crash while writing) is ignored.
+    """
+    header, results, trailer = {}, [], None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("stream") == "end":
+                trailer = record
+            elif "stream" in record:
+                header = record
+            else:
+                results.append(record)
+    return header, results, trailer
+
+
+class OutputCapture:
+    """
+    Streams one test execution's stdout/stderr to its per-test log file and keeps only a
+    bounded tail plus the first error lines in memory. Listeners receive every line.
+    """
+    def __init__(self, writer, log_path, key, ignored_pattern=None):
+        self.writer = writer
+        self.log_path = log_path
+        self.key = key
+        self.ignored_pattern = ignored_pattern
+        self.ignored_error_seen = False
+        self.tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        self.first_errors = []
+        self.listeners = []
+        self._lock = threading.Lock()
+        # Wall-clock phases of the execution for the trace export: [name, start, end] (epoch seconds)
+        self.spans = []
+        self.opened = time.time()
+        self.spawned = None       # When the process was started (set by _run_streaming)
+        self.first_output = None  # When its first line arrived (psql: once it has connected)
+        writer.begin(key, log_path)
+
+    def feed(self, stream, line):
+        """Handle one line ('stdout' or 'stderr'), including its trailing newline if any"""
+        if not line.endswith("\n"):
+            line += "\n"
+        with self._lock:
+            if self.first_output is None:
+                self.first_output = time.time()
+            self.writer.write(self.log_path, line)
+            self.tail.append(line.rstrip("\n"))
+            if stream == "stderr" and line.strip():
+                if len(self.first_errors) < OUTPUT_ERROR_LINES:
+                    self.first_errors.append(line.rstrip("\n"))
+                if self.ignored_pattern and re.search(self.ignored_pattern, line, re.IGNORECASE):
+                    self.ignored_error_seen = True
+            for listener in self.listeners:
+                listener(stream, line)
+
+    def pump(self, stream, pipe):
+        """Read a text pipe until EOF (run in a reader thread)"""
+        try:
+            for line in pipe:
+                self.feed(stream, line)
+        finally:
+            pipe.close()
+
+    def span(self, name, start, end):
+        self.spans.append(_span(name, start, end))
+
+    def close(self):
+        self.writer.end(self.key, self.log_path)
+        # Statement 'finished_at' offsets count from the start of this span
+        self.span("execute", self.opened, time.time())
+
+    def summary(self):
+        """Report fields for this execution"""
+        return {"log_file": self.log_path, "output_tail": list(self.tail), "error_lines": list(self.first_errors),
+                "spans": self.spans}
+
+
+def _span(name, start, end):
+    """One timed phase of a test for the trace export: [name, start, end] in epoch seconds"""
+    return [name, round(start, 6), round(end, 6)]
+
+
+_EXPLAIN_RE = re.compile(r"^\s*(?:/\*.*?\*/\s*|--[^\n]*\n\s*)*explain\b", re.IGNORECASE | re.DOTALL)
+_PLAN_NOISE_RE = re.compile(r"\s*\((?:cost=|actual |never executed)[^)]*\)")
+_PLAN_SLICE_RE = re.compile(r"\s*\(slice\d+[^)]*\)")
+_PLAN_MOTION_RE = re.compile(r"\b\d+:\d+\b")
+_PLAN_SHAPE_PROPERTIES = ("Optimizer:", "Number of partitions to scan:", "Partitions selected:")
+
+
+def _plan_shape(plan_lines):
+    """
+    Normalized shape of a text EXPLAIN plan: one entry per plan node (indented by depth),
+    without costs, row estimates, timings, slice numbers or motion segment counts, plus the
+    few property lines that describe the plan rather than its run (optimizer, partition pruning).
+    Returns {"fingerprint": sha1 of the shape, "nodes": [...]}.
+    """
+    nodes = []
+    stack = []  # indentation of the enclosing nodes
+    for i, line in enumerate(plan_lines):
+        stripped = line.strip()
+        if stripped.startswith("->"):
+            label = stripped[2:].strip()
+        elif i == 0:
+            label = stripped
+        elif stripped.startswith(_PLAN_SHAPE_PROPERTIES):
+            nodes.append("  " * len(stack) + f"[{stripped}]")
+            continue
+        else:
+            continue
+        indent = len(line) - len(line.lstrip())
+        while stack and stack[-1] >= indent:
+            stack.pop()
+        label = _PLAN_MOTION_RE.sub("", _PLAN_SLICE_RE.sub("", _PLAN_NOISE_RE.sub("", label)))
+        nodes.append("  " * len(stack) + " ".join(label.split()))
+        stack.append(indent)
+    fingerprint = hashlib.sha1("\n".join(nodes).encode("utf-8")).hexdigest()[:16]
+    return {"fingerprint": fingerprint, "nodes": nodes}
+
+
+# Output that differs between correct runs: now() values, UUIDs, timings, OIDs, per-run object names
+_ANSWER_NORMALIZE = [
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}\.\d+(?:[+-]\d{2}(?::\d{2})?)?"), "<timestamp>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<uuid>"),
+    (re.compile(r"\b\d+(?:\.\d+)? ms\b"), "<n> ms"),
+    (re.compile(r"\b(oid|relfilenode)(\s*[=:]?\s*)\d+", re.IGNORECASE), r"\1\2<oid>"),
+    (re.compile(r"\bpg_temp_\d+\b"), "pg_temp_N"),
+    (re.compile(r"\bcbt_[0-9a-f]{8}_\d+_"), "cbt_<run>_"),
+    (re.compile(r"\b(cbdb_fx_\w*?)_[0-9a-f]{8}\b"), r"\1_<key>"),
+]
+_ANSWER_FLOAT_RE = re.compile(r"\b\d+\.\d{10,}(?:e[+-]?\d+)?\b")  # Last digits of floats vary by platform
+_ANSWER_SEPARATOR_RE = re.compile(r"^-+(?:\+-+)*$")
+_ANSWER_TAG_RE = re.compile(r"^[A-Z]+(?: [A-Z]+)*(?: \d+)*$")
+# Statements whose values are random by design: only their columns and row counts are compared
+_ANSWER_VOLATILE_RE = re.compile(
+    r"\b(?:random|setseed|gen_random_uuid|gen_random_bytes|uuid_generate_v[14]|clock_timestamp|statement_timestamp|"
+    r"transaction_timestamp|timeofday|now|pg_backend_pid|txid_current|current_timestamp|localtimestamp)\b", re.IGNORECASE)
+
+
+def _normalize_answer_line(line):
+    """One result line as compared across runs: cells without padding, nondeterministic values masked"""
+    line = "|".join(cell.strip() for cell in line.split("|")) if "|" in line else line.strip()
+    for regex, replacement in _ANSWER_NORMALIZE:
+        line = regex.sub(replacement, line)
+    return _ANSWER_FLOAT_RE.sub(lambda m: f"{float(m.group(0)):.10g}", line)
+
+
+def _row_hash(line):
+    return int.from_bytes(hashlib.blake2b(line.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+_ORDER_BY_SKIP_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\$(\w*)\$.*?\$\1\$|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_ORDER_BY_TOKEN_RE = re.compile(r"\(|\)|\border\s+by\b", re.IGNORECASE)
+
+
+def _has_top_level_order_by(text):
+    """True if the statement sorts its result: ORDER BY outside parentheses, literals and comments"""
+    depth = 0
+    for m in _ORDER_BY_TOKEN_RE.finditer(_ORDER_BY_SKIP_RE.sub(" ", text)):
+        token = m.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            return True
+    return False
+
+
+class StatementTracker:
+    """
+    Capture listener that turns '\\timing' output into per-statement results.
+    psql prints one 'Time: N ms' line per statement it sends (also for failed ones), so
+    the k-th Time line belongs to the k-th statement of the file. Errors are matched by
+    the line number in psql's 'psql:<file>:<line>: ERROR:' prefix, row counts by the
+    '(N rows)' footer or the command tag printed since the previous Time line.
+    The output of EXPLAIN statements (between 'QUERY PLAN' and '(N rows)') is kept as plan shape.
+    With answers=True, each statement's result sets are also digested while they stream by
+    (see answers()), so only a bounded sample is kept: rows of a statement with a top-level
+    ORDER BY go into a rolling digest, all other rows are summed into an order-independent hash.
+    """
+    TIME_RE = re.compile(r"^Time: ([0-9.]+) ms")
+    ROWS_RE = re.compile(r"^\((\d+) rows?\)$")
+    TAG_RE = re.compile(r"^(?:INSERT \d+|UPDATE|DELETE|SELECT|COPY|MERGE|MOVE|FETCH) (\d+)$")
+    ERROR_RE = re.compile(r"^psql:.*?:(\d+): (?:ERROR|FATAL|PANIC):\s+(.*)$")
+
+    def __init__(self, statements, answers=False):
+        self.statements = [s for s in statements if not s["meta"]]
+        self.started = time.monotonic()
+        self.results = [
+            {
+                "index": i + 1,
+                "line": stmt["line"],
+                "text": " ".join(stmt["text"].split())[:STATEMENT_TEXT_MAX],
+                "duration": None,
+                "rows": None,
+                "error": None,
+                "finished_at": None,
+            }
+            for i, stmt in enumerate(self.statements)
+        ]
+        self._by_end_line = {}
+        for i, stmt in enumerate(self.statements):
+            self._by_end_line.setdefault(stmt["end_line"], []).append(i)
+        self._explain = [bool(_EXPLAIN_RE.match(stmt["text"])) for stmt in self.statements]
+        self._next = 0
+        self._rows = None
+        self._plan = None  # Lines of the plan being read, None outside of a plan
+        self._answers = [{"sections": [], "tag": None} for _ in self.statements] if answers else None
+        self._ordered = [_has_top_level_order_by(stmt["text"]) for stmt in self.statements] if answers else None
+        self._section = None    # Result set being read: header, row hash sum, sample rows
+        self._prev_line = None  # Header candidate for a separator line
+        self._last_line = None  # Command tag candidate for the next Time line
+
+    def __call__(self, stream, line):
+        line = line.rstrip("\n")
+        if stream == "stderr":
+            m = self.ERROR_RE.match(line)
+            if m:
+                # Several statements may end on one line; give the error to the first free one
+                for i in self._by_end_line.get(int(m.group(1)), ()):
+                    if self.results[i]["error"] is None:
+                        self.results[i]["error"] = m.group(2)[:STATEMENT_TEXT_MAX]
+                        break
+            return
+
+        if self._answers is not None:
+            self._answer_line(line)
+        stripped = line.strip()
+        if self._plan is not None:
+            if self.ROWS_RE.match(stripped):
+                self.results[self._next]["plan"] = _plan_shape(self._plan[1:])  # skip the dash line
+                self._plan = None
+            else:
+                self._plan.append(line)
+                return
+        elif stripped == "QUERY PLAN" and self._next < len(self.results) and self._explain[self._next]:
+            self._plan = []
+            return
+
+        m = self.TIME_RE.match(stripped)
+        if m:
+            if self._next < len(self.results):
+                entry = self.results[self._next]
+                entry["duration"] = round(float(m.group(1)) / 1000.0, 6)
+                entry["rows"] = self._rows
+                entry["finished_at"] = round(time.monotonic() - self.started, 6)
+            self._next += 1
+            self._rows = None
+            self._plan = None
+            return
+        m = self.ROWS_RE.match(stripped) or self.TAG_RE.match(stripped)
+        if m:
+            self._rows = int(m.group(1))
+
+    def _answer_line(self, line):
+        """Adds one stdout line to the answer of the statement being read"""
+        stripped = line.strip()
+        if self.TIME_RE.match(stripped):
+            if self._next < len(self._answers) and self._last_line and _ANSWER_TAG_RE.match(self._last_line):
+                self._answers[self._next]["tag"] = self._last_line
+            self._section = self._prev_line = self._last_line = None
+            return
+        if _ANSWER_SEPARATOR_RE.match(stripped) and self._prev_line is not None:
+            # A new header; starts over if an echoed '-----' comment looked like one
+            ordered = self._next < len(self._ordered) and self._ordered[self._next]
+            self._section = {"header": _normalize_answer_line(self._prev_line), "sum": 0, "sample": [],
+                             "ordered": hashlib.blake2b(digest_size=8) if ordered else None}
+        elif self._section is not None:
+            m = self.ROWS_RE.match(stripped)
+            if m:
+                self._section["count"] = int(m.group(1))
+                if self._next < len(self._answers):
+                    self._answers[self._next]["sections"].append(self._section)
+                self._section = None
+            else:
+                row = _normalize_answer_line(line)
+                if self._section["ordered"] is not None:
+                    self._section["ordered"].update(row.encode("utf-8") + b"\n")
+                else:
+                    self._section["sum"] = (self._section["sum"] + _row_hash(row)) & 0xFFFFFFFFFFFFFFFF
+                if len(self._section["sample"]) < ANSWER_DIFF_LINES:
+                    self._section["sample"].append(row)
+        if stripped:
+            self._last_line = stripped
+        self._prev_line = line
+
+    def answers(self):
+        """
+        Normalized answer of every statement that ran: its result sets (header, row count and a hash
+        of the rows, order-independent unless the statement has ORDER BY; plan shape for EXPLAIN),
+        command tag and error. Each entry has 'key', 'index', 'line', 'hash', 'rows' and 'lines'
+        (the sample for diffs, sorted unless the order matters).
+        """
+        answers = []
+        for i, (stmt, parts) in enumerate(zip(self.results, self._answers or [])):
+            if stmt["duration"] is None:
+                continue  # Never ran (timeout, lost connection)
+            volatile = bool(_ANSWER_VOLATILE_RE.search(self.statements[i]["text"]))
+            digest = hashlib.sha1()
+            lines, rows, truncated = [], 0, False
+            if self._explain[i] and stmt.get("plan"):
+                digest.update(stmt["plan"]["fingerprint"].encode("utf-8"))
+                lines.extend(stmt["plan"]["nodes"])
+            else:
+                for section in parts["sections"]:
+                    rows += section["count"]
+                    ordered = section["ordered"] is not None
+                    if volatile:
+                        rows_hash = "0"
+                    else:
+                        rows_hash = f"o{section['ordered'].hexdigest()}" if ordered else f"{section['sum']:016x}"
+                    digest.update(f"{section['header']}\x1f{rows_hash}\x1f{section['count']}\x1e".encode("utf-8"))
+                    lines.append(section["header"])
+                    if not volatile:
+                        lines.extend(section["sample"] if ordered else sorted(section["sample"]))
+                        truncated = truncated or len(section["sample"]) < section["count"]
+                    lines.append(f"({section['count']} rows)")
+            for extra in (parts["tag"], f"ERROR: {_normalize_answer_line(stmt['error'])}" if stmt["error"] else None):
+                if extra:
+                    digest.update(extra.encode("utf-8") + b"\x1e")
+                    lines.append(extra)
+            answer = {"key": _statement_key(stmt), "index": stmt["index"], "line": stmt["line"],
+                      "hash": digest.hexdigest()[:16], "rows": rows, "lines": lines}
+            if volatile:
+                answer["volatile"] = True
+            if truncated:
+                answer["truncated"] = True
+            answers.append(answer)
+        return answers
+
+
+def _run_streaming(command, capture, env=None, timeout=None):
+    """
+    Runs a command, streaming stdout/stderr line by line into an OutputCapture.
+    Returns the exit code. On timeout the process is killed and TimeoutExpired is raised.
+    """
+    spawn_started = time.time()
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, encoding="utf-8", errors="replace", env=env)
+    capture.spawned = time.time()
+    capture.span("spawn", spawn_started, capture.spawned)
+    readers = [
+        threading.Thread(target=capture.pump, args=("stdout", proc.stdout), daemon=True),
+        threading.Thread(target=capture.pump, args=("stderr", proc.stderr), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    try:
+        return proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        for reader in readers:
+            reader.join()
+
+
+async def _pump_async(capture, stream, reader):
+    """Read an asyncio stream until EOF, feeding each whole line to the capture (like OutputCapture.pump)"""
+    pending = b""  # Start of a line longer than ASYNC_STREAM_LIMIT
+    while True:
+        try:
+            data = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            data = e.partial  # EOF: a last line without newline, or nothing
+        except asyncio.LimitOverrunError as e:
+            # No newline within the limit; the buffered bytes are still there: take them and read on
+            pending += await reader.read(e.consumed)
+            continue
+        data, pending = pending + data, b""
+        if not data:
+            break
+        capture.feed(stream, data.decode("utf-8", errors="replace"))
+
+
+async def _run_streaming_async(command, capture, env=None, timeout=None):
+    """
+    Coroutine version of _run_streaming for the asyncio engine: no threads per process.
+    On timeout the process is killed and TimeoutExpired is raised; on cancellation it is killed too.
+    """
+    spawn_started = time.time()
+    proc = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        env=env, limit=ASYNC_STREAM_LIMIT)
+    capture.spawned = time.time()
+    capture.span("spawn", spawn_started, capture.spawned)
+    readers = asyncio.gather(_pump_async(capture, "stdout", proc.stdout), _pump_async(capture, "stderr", proc.stderr))
+    try:
+        return await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(command, timeout)
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
+    finally:
+        await readers
+
+
+class AsyncLoop:
+    """
+    asyncio event loop on a background thread, used by '--engine async'. Coroutines are
+    submitted from other threads and return concurrent.futures.Future objects, so the
+    TaskScheduler can wait on them next to its thread-pool futures.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._use_pidfd_watcher()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="async-loop", daemon=True)
+        self.thread.start()
+
+    def _use_pidfd_watcher(self):
+        """
+        Before Python 3.12 the default child watcher starts one thread per subprocess;
+        pidfds (Linux 5.3+) let the loop itself wait for hundreds of psql processes.
+        """
+        if sys.version_info >= (3, 12) or not hasattr(asyncio, "PidfdChildWatcher") or not hasattr(os, "pidfd_open"):
+            return
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                watcher = asyncio.PidfdChildWatcher()
+                watcher.attach_loop(self.loop)
+                asyncio.set_child_watcher(watcher)
+        except (OSError, RuntimeError, NotImplementedError):
+            pass  # Keep the default watcher
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def close(self):
+        """Cancel whatever is still running (killing its processes) and stop the loop"""
+        async def _cancel_all():
+            current = asyncio.current_task()
+            tasks = [t for t in asyncio.all_tasks() if t is not current]
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self.loop.is_running():
+            self.submit(_cancel_all()).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+        self.loop.close()
+# --------------------------------------
+
+
+# --- SQL Script Helpers ---
+_DOLLAR_QUOTE_RE = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$")
+
+
+def _split_sql_statements(sql_text):
+    """
+    Splits a SQL script into statements the way psql does.
+    - Honors quotes, dollar quoting, comments and parentheses.
+    - psql meta-commands (e.g. '\\c') are returned as separate entries with 'meta' set.
+    Each entry is a dict with 'line' (first line), 'end_line', 'text' and 'meta'.
+    """
+    statements = []
+    n = len(sql_text)
+    i = 0
+    line = 1
+    start = None
+    start_line = None
+    depth = 0
+
+    while i < n:
+        ch = sql_text[i]
+        if ch == "\n":
+            line += 1
+            i += 1
+            continue
+        if ch.isspace():
+            i += 1
+            continue
+        if sql_text.startswith("--", i):
+            j = sql_text.find("\n", i)
+            i = n if j == -1 else j
+            continue
+        if sql_text.startswith("/*", i):
+            nesting = 0
+            while i < n:
+                if sql_text.startswith("/*", i):
+                    nesting += 1
+                    i += 2
+                elif sql_text.startswith("*/", i):
+                    nesting -= 1
+                    i += 2
+                    if nesting == 0:
+                        break
+                else:
+                    if sql_text[i] == "\n":
+                        line += 1
+                    i += 1
+            continue
+        if ch == "\\":
+            # Meta-commands run to the end of the line and do not end the current statement
+            j = sql_text.find("\n", i)
+            j = n if j == -1 else j
+            statements.append({"line": line, "end_line": line, "text": sql_text[i:j].strip(), "meta": True})
+            i = j
+            continue
+
+        if start is None:
+            start = i
+            start_line = line
+
+        if ch in ("'", '"'):
+            backslash_escapes = ch == "'" and i > 0 and sql_text[i - 1] in "eE"
+            j = i + 1
+            while j < n:
+                c = sql_text[j]
+                if c == "\n":
+                    line += 1
+                elif backslash_escapes and c == "\\":
+                    j += 2
+                    continue
+                elif c == ch:
+                    if j + 1 < n and sql_text[j + 1] == ch:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            i = j + 1
+            continue
+        if ch == "$" and not (i > 0 and (sql_text[i - 1].isalnum() or sql_text[i - 1] == "_")):
+            m = _DOLLAR_QUOTE_RE.match(sql_text, i)
+            if m:
+                j = sql_text.find(m.group(0), m.end())
+                j = n if j == -1 else j + len(m.group(0))
+                line += sql_text.count("\n", i, j)
+                i = j
+                continue
+
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+        elif ch == ";" and depth == 0:
+            statements.append({"line": start_line, "end_line": line, "text": sql_text[start:i + 1].strip(), "meta": False})
+            start = None
+        i += 1
+
+    # psql sends whatever is left in the query buffer at end of file
+    if start is not None:
+        statements.append({"line": start_line, "end_line": line, "text": sql_text[start:].strip(), "meta": False})
+    return statements
+
+
+def _read_statements(file_path):
+    """Split a SQL file into statements, or return None if it cannot be read"""
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return _split_sql_statements(f.read())
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+_CREATE_EXTENSION_RE = re.compile(r"^\s*(?:/\*.*?\*/\s*|--[^\n]*\n\s*)*create\s+extension\b", re.IGNORECASE | re.DOTALL)
+
+
+def _creates_extension(file_path):
+    """True if the file runs CREATE EXTENSION"""
+    return any(_CREATE_EXTENSION_RE.match(s["text"]) for s in _read_statements(file_path) or ())
+
+
+def _format_cursor_result(cursor):
+    """Renders a cursor's result roughly the way 'psql' prints it."""
+    if cursor.description is None:
+        return [cursor.statusmessage] if cursor.statusmessage else []
+
+    lines = [" " + " | ".join(col.name for col in cursor.description), "-" * 20]
+    row_count = 0
+    for row in cursor:
+        lines.append(" " + " | ".join("" if v is None else str(v) for v in row))
+        row_count += 1
+    lines.append(f"({row_count} {'row' if row_count == 1 else 'rows'})")
+    lines.append("")
+    return lines
+
+
+def _psql_query_command(db_config, sql, dbname=None):
+    """Command line and environment for a single housekeeping statement"""
+    command = [
+        'psql', '-X', '-w', '-q', '-tA',
+        '-v', 'ON_ERROR_STOP=1',
+        '-h', db_config['host'],
+        '-p', str(db_config['port']),
+        '-U', db_config['user'],
+        '-d', dbname or db_config['dbname'],
+        '-c', sql,
+    ]
+    env = os.environ.copy()
+    env['PGPASSWORD'] = db_config['password']
+    return command, env
+
+
+def _psql_query(db_config, sql, dbname=None, timeout=ADMIN_TIMEOUT_SECONDS):
+    """
+    Runs a single housekeeping statement with 'psql -c' (unaligned, tuples only).
+    Returns (return_code, stdout, stderr); return_code is -1 if psql could not be run.
+    """
+    command, env = _psql_query_command(db_config, sql, dbname)
+    try:
+        result = subprocess.run(command, check=False, capture_output=True, text=True, env=env, timeout=timeout)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        return -1, "", str(e)
+    return result.returncode, result.stdout.strip(), result.stderr.strip()
+
+
+def _psql_script(db_config, file_path, dbname, timeout=SQL_TIMEOUT_SECONDS):
+    """
+    Runs a setup script with 'psql -f', stopping at the first error.
+    Returns (return_code, stdout, stderr); return_code is -1 if psql could not be run.
+    """
+    command = [
+        'psql', '-X', '-w', '-q',
+        '-v', 'ON_ERROR_STOP=1',
+        '-h', db_config['host'],
+        '-p', str(db_config['port']),
+        '-U', db_config['user'],
+        '-d', dbname,
+        '-f', file_path,
+    ]
+    env = os.environ.copy()
+    env['PGPASSWORD'] = db_config['password']
+    try:
+        result = subprocess.run(command, check=False, capture_output=True, text=True, env=env, timeout=timeout)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        return -1, "", str(e)
+    return result.returncode, result.stdout.strip(), result.stderr.strip()
+
+
+async def _psql_query_async(db_config, sql, dbname=None, timeout=ADMIN_TIMEOUT_SECONDS):
+    """Coroutine version of _psql_query for the asyncio engine"""
+    command, env = _psql_query_command(db_config, sql, dbname)
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=env)
+    except OSError as e:
+        return -1, "", str(e)
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return -1, "", f"Timed out after {timeout} seconds"
+    return proc.returncode, stdout.decode("utf-8", "replace").strip(), stderr.decode("utf-8", "replace").strip()
+
+
+def _sql_literal(value):
+    """A string as a SQL literal (standard_conforming_strings, the default since PostgreSQL 9.1)"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _stat_snapshot_sql(view, dbname, settle=False):
+    """Query for one database's counters from pg_stat_database, or per segment from gp_stat_database"""
+    segment = "gp_segment_id" if view == "gp_stat_database" else "-1"
+    datname = _sql_literal(dbname)
+    sql = f"SELECT {segment}, {', '.join(SERVER_STAT_COUNTERS)} FROM {view} WHERE datname = {datname}"
+    if settle:
+        # Sessions hand in their counters when they exit: wait (up to 1s) until the test's sessions are gone.
+        # Their last report may show up a stats interval later, so then re-read until two reads one
+        # SERVER_STATS_SETTLE apart agree.
+        counters = ", ".join(SERVER_STAT_COUNTERS)
+        sql = ("DO $settle$DECLARE previous text; current text; BEGIN "
+               "FOR i IN 1..50 LOOP PERFORM pg_stat_clear_snapshot(); "
+               f"EXIT WHEN NOT EXISTS (SELECT 1 FROM pg_stat_activity WHERE datname = {datname}); "
+               "PERFORM pg_sleep(0.02); END LOOP; "
+               f"FOR i IN 1..{SERVER_STATS_SETTLE_READS} LOOP PERFORM pg_stat_clear_snapshot(); "
+               f"SELECT string_agg(concat_ws('|', {segment}, {counters}), ',' ORDER BY {segment}) INTO current "
+               f"FROM {view} WHERE datname = {datname}; "
+               "EXIT WHEN current IS NOT DISTINCT FROM previous; previous := current; "
+               f"PERFORM pg_sleep({SERVER_STATS_SETTLE}); END LOOP; END$settle$; " + sql)
+    return sql
+
+
+def _parse_stat_snapshot(out):
+    """{segment: {counter: value}} from the rows of a _stat_snapshot_sql query"""
+    snapshot = {}
+    for line in out.splitlines():
+        fields = line.split("|")
+        if len(fields) != len(SERVER_STAT_COUNTERS) + 1:
+            continue
+        try:
+            values = [int(v or 0) for v in fields]
+        except ValueError:
+            continue
+        snapshot[values[0]] = dict(zip(SERVER_STAT_COUNTERS, values[1:]))
+    return snapshot
+
+
+def _server_stats(dbname, attribution, before, after):
+    """
+    Counter deltas of one test from two (return_code, stdout, stderr) snapshots. 'attribution' is
+    'database' when the test had the database to itself, 'shared' when concurrent tests count too.
+    """
+    stats = {"attribution": attribution, "database": dbname}
+    for return_code, _, error in (before, after):
+        if return_code != 0:
+            stats["error"] = (error or f"psql exited with code {return_code}").splitlines()[0]
+            return stats
+    start, end = _parse_stat_snapshot(before[1]), _parse_stat_snapshot(after[1])
+    segments = {seg: {k: v - start.get(seg, {}).get(k, 0) for k, v in counters.items()} for seg, counters in end.items()}
+    stats.update({k: sum(counters[k] for counters in segments.values()) for k in SERVER_STAT_COUNTERS})
+    blocks = stats["blks_read"] + stats["blks_hit"]
+    stats["hit_ratio"] = round(stats["blks_hit"] / blocks, 4) if blocks else None
+    stats["tup_written"] = stats["tup_inserted"] + stats["tup_updated"] + stats["tup_deleted"]
+    if len(segments) > 1:
+        stats["segments"] = {str(seg): counters for seg, counters in sorted(segments.items())}
+    return stats
+
+
+def _fixture_db_name(names, definition_key):
+    """
+    Template database of a fixture set: a readable stem, a hash of the full name set (the stem is
+    cut short) and a key suffix that changes whenever a fixture definition does
+    """
+    stem = re.sub(r"[^a-z0-9_]", "_", "_".join(names).lower())[:24]
+    name_set = hashlib.sha256("\0".join(names).encode("utf-8")).hexdigest()[:8]
+    return f"cbdb_fx_{stem}_{name_set}_{definition_key[:8]}"
+
+
+def _isolation_name(run_token, seq, file_name):
+    """Unique, valid identifier for a test's private schema or database"""
+    stem = re.sub(r"[^a-z0-9_]", "_", os.path.splitext(file_name)[0].lower())
+    return f"cbt_{run_token}_{seq}_{stem}"[:63]
+# --------------------------------------
+
+
+# --- Answer Files ---
+def _load_answer_index(path):
+    """The answer index ({'version', 'files': {file: {'engine', 'statements'}}}), empty if missing or unreadable"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if isinstance(index, dict) and isinstance(index.get("files"), dict) and index.get("version") == ANSWER_INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": ANSWER_INDEX_VERSION, "files": {}}
+
+
+def _stored_answer(answer):
+    """Index entry of one statement: the output lines themselves only when they are few and complete"""
+    entry = {k: answer[k] for k in ("key", "index", "line", "hash", "rows")}
+    if answer.get("volatile"):
+        entry["volatile"] = True
+    if len(answer["lines"]) <= ANSWER_INLINE_LINES and not answer.get("truncated"):
+        entry["lines"] = answer["lines"]
+    return entry
+
+
+def _answer_diff(mismatches):
+    """Unified diff lines for (expected entry, actual answer) pairs; without stored lines, the actual sample"""
+    out = []
+    for expected, actual in mismatches:
+        title = f"#{actual['index']} (line {actual['line']})"
+        if expected.get("lines") is not None:
+            out.extend(difflib.unified_diff(expected["lines"], actual["lines"], f"expected {title}", f"actual {title}", lineterm=""))
+        else:
+            out.append(f"--- expected {title}: {expected['rows']} row(s), hash {expected['hash']} (output too large to store)")
+            out.append(f"+++ actual {title}: {actual['rows']} row(s), hash {actual['hash']}")
+            out.extend("+" + line for line in actual["lines"])
+        if actual.get("truncated"):
+            out.append(f"(only the first {ANSWER_DIFF_LINES} rows of each result set were kept, sorted unless ordered by the statement)")
+    return out
+# --------------------------------------
+
+
+# --- Run History and Baselines ---
+def _statement_key(stmt):
+    """Identity of a statement across runs: its position plus a hash of its text"""
+    digest = hashlib.sha1(stmt.get("text", "").encode("utf-8")).hexdigest()[:12]
+    return f"{stmt.get('index')}:{digest}"
+
+
+class HistoryStore:
+    """
+    Append-only JSONL file with one record per run: per-test status and duration plus
+    per-statement durations. Feeds duration prediction and '--compare-baseline'.
+    """
+    def __init__(self, path=os.path.join(REPORT_DIR, HISTORY_FILE)):
+        self.path = path
+
+    def runs(self, limit=None):
+        """Most recent run records, oldest first. Corrupt lines (e.g. an interrupted append) are skipped."""
+        if not os.path.exists(self.path):
+            return []
+        records = deque(maxlen=limit)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and isinstance(record.get("results"), list):
+                        records.append(record)
+        except OSError:
+            return []
+        return list(records)
+
+    def append(self, record):
+        """Add one run record as a single line"""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    @staticmethod
+    def make_record(run_id, start_time, end_time, target, results):
+        """Compact run record: only what baselines and predictions need"""
+        entries = []
+        for r in results:
+            entry = {"type": r.get("type"), "file": r.get("file"), "status": r.get("status"), "duration": r.get("duration")}
+            if r.get("statements"):
+                entry["statements"] = {
+                    _statement_key(stmt): stmt["duration"]
+                    for stmt in r["statements"] if stmt.get("duration") is not None and not stmt.get("error")
+                }
+                plans = {_statement_key(stmt): stmt["plan"] for stmt in r["statements"] if stmt.get("plan")}
+                if plans:
+                    entry["plans"] = plans
+            entries.append(entry)
+        return {"run_id": run_id, "start_time": str(start_time), "end_time": str(end_time),
+                "target": target, "results": entries}
+
+
+class BaselineComparator:
+    """
+    Flags tests (and statements) that are significantly slower than in earlier runs.
+    A value regresses when it exceeds the baseline median by REGRESSION_SIGMA standard
+    deviations, by the relative slowdown and by the absolute delta all at once.
+    The baseline of each value is its last max_samples SUCCESS samples, however many
+    runs back they are, so a regression keeps failing until the history is reset
+    (or the code gets fast again).
+    """
+    def __init__(self, runs, max_samples=BASELINE_RUNS, sigma=REGRESSION_SIGMA, min_slowdown=REGRESSION_MIN_SLOWDOWN,
+                 min_delta=REGRESSION_MIN_DELTA, min_samples=BASELINE_MIN_SAMPLES):
+        self.sigma = sigma
+        self.min_slowdown = min_slowdown
+        self.min_delta = min_delta
+        self.min_samples = min_samples
+        self.files = {}       # (type, file) -> deque of durations, oldest first
+        self.statements = {}  # (type, file, statement key) -> deque of durations, oldest first
+        for run in runs:
+            for r in run.get("results", []):
+                if r.get("status") != "SUCCESS" or r.get("duration") is None:
+                    continue
+                key = (r.get("type"), r.get("file"))
+                self.files.setdefault(key, deque(maxlen=max_samples)).append(float(r["duration"]))
+                for stmt_key, duration in (r.get("statements") or {}).items():
+                    self.statements.setdefault(key + (stmt_key,), deque(maxlen=max_samples)).append(float(duration))
+
+    def _check(self, samples, value):
+        """Baseline statistics for one value, or None without enough samples"""
+        if not samples or len(samples) < self.min_samples:
+            return None
+        median = statistics.median(samples)
+        stdev = statistics.stdev(samples) if len(samples) > 1 else 0.0
+        threshold = max(median + self.sigma * stdev, median * (1 + self.min_slowdown), median + self.min_delta)
+        return {
+            "samples": len(samples),
+            "median": round(median, 6),
+            "stdev": round(stdev, 6),
+            "threshold": round(threshold, 6),
+            "ratio": round(value / median, 3) if median > 0 else None,
+            "regressed": value > threshold,
+        }
+
+    def compare(self, result):
+        """Annotate a result with its baseline and mark it REGRESSED if it is too slow. Returns True on regression."""
+        if result.get("status") != "SUCCESS":
+            return False
+        key = (result.get("type"), result.get("file"))
+        reasons = []
+
+        baseline = self._check(self.files.get(key), result["duration"])
+        if baseline:
+            result["baseline"] = baseline
+            if baseline["regressed"]:
+                reasons.append(f"{result['duration']:.3f}s vs baseline median {baseline['median']:.3f}s "
+                               f"({baseline['samples']} runs)")
+
+        for stmt in result.get("statements") or []:
+            if stmt.get("duration") is None or stmt.get("error"):
+                continue
+            stmt_baseline = self._check(self.statements.get(key + (_statement_key(stmt),)), stmt["duration"])
+            if stmt_baseline:
+                stmt["baseline_median"] = stmt_baseline["median"]
+                if stmt_baseline["regressed"]:
+                    stmt["regressed"] = True
+                    reasons.append(f"statement #{stmt['index']} (line {stmt['line']}) {stmt['duration']:.3f}s "
+                                   f"vs baseline median {stmt_baseline['median']:.3f}s")
+
+        if not reasons:
+            return False
+        result["status"] = "REGRESSED"
+        result["error"] = "Slower than baseline: " + "; ".join(reasons[:3]) + (" ..." if len(reasons) > 3 else "")
+        return True
+
+
+class PlanHistory:
+    """
+    Latest recorded plan shape of every EXPLAIN statement, used to flag plan changes
+    (e.g. a lost Parallel Seq Scan or a RuntimeFilter that disappeared) between runs.
+    """
+    def __init__(self, runs):
+        self.plans = {}  # (type, file, statement key) -> {"fingerprint", "nodes"}
+        for run in runs:  # Oldest first, so later runs win
+            for r in run.get("results", []):
+                for stmt_key, plan in (r.get("plans") or {}).items():
+                    self.plans[(r.get("type"), r.get("file"), stmt_key)] = plan
+
+    def compare(self, result):
+        """Annotate statements whose plan shape changed with the lost/added nodes. Returns the number of changes."""
+        changes = 0
+        for stmt in result.get("statements") or []:
+            plan = stmt.get("plan")
+            if not plan:
+                continue
+            previous = self.plans.get((result.get("type"), result.get("file"), _statement_key(stmt)))
+            if not previous or previous.get("fingerprint") == plan["fingerprint"]:
+                continue
+            before = Counter(n.strip() for n in previous.get("nodes", []))
+            after = Counter(n.strip() for n in plan["nodes"])
+            stmt["plan_change"] = {
+                "previous_fingerprint": previous.get("fingerprint"),
+                "lost": sorted((before - after).elements()),
+                "added": sorted((after - before).elements()),
+            }
+            changes += 1
+        if changes:
+            result["plan_changes"] = changes
+        return changes
+
+
+def _runner_version():
+    """Hash of this script, so that changing the runner invalidates cached results"""
+    try:
+        with open(os.path.abspath(__file__), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    except OSError:
+        return "unknown"
+
+
+class ResultCache:
+    """
+    Content-hash cache of passing tests for '--changed-only'. A test's key covers its
+    file content, the keys of its @depends files, the runner configuration, the server
+    version and the runner script itself. A test whose key matches an earlier SUCCESS
+    is reported as CACHED instead of being run. Entries are only removed explicitly
+    ('--clear-cache') or when the test stops passing.
+    """
+    def __init__(self, path=os.path.join(REPORT_DIR, RESULT_CACHE_FILE), server_version=None):
+        self.path = path
+        self.server_version = server_version  # None: version unknown, never serve cached results
+        self.runner_version = _runner_version()
+        self.entries = {}  # "type/file" -> {"key", "duration", "run", "time"}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                self.entries = entries
+        except (OSError, ValueError):
+            pass
+
+    def key(self, test_type, file_path, config, dependency_keys):
+        """Cache key of one test, or None if its file cannot be read"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([test_type, config, dependency_keys, self.server_version, self.runner_version],
+                                 sort_keys=True).encode("utf-8"))
+        try:
+            with open(file_path, "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    def lookup(self, test_type, file_name, key):
+        """The cached entry if this exact key passed before"""
+        if key is None or self.server_version is None:
+            return None
+        entry = self.entries.get(f"{test_type}/{file_name}")
+        return entry if entry and entry.get("key") == key else None
+
+    def update(self, results, run_id):
+        """Remember passing results and forget tests that did not pass"""
+        for r in results:
+            name = f"{r.get('type')}/{r.get('file')}"
+            if r.get("status") == "SUCCESS" and r.get("cache_key") and self.server_version is not None:
+                self.entries[name] = {"key": r["cache_key"], "duration": r.get("duration"),
+                                      "run": run_id, "time": r.get("end_time")}
+            elif r.get("status") in ("FAILED", "REGRESSED", "SKIPPED"):
+                self.entries.pop(name, None)
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1, ensure_ascii=False, sort_keys=True)
+
+    @staticmethod
+    def clear(path=os.path.join(REPORT_DIR, RESULT_CACHE_FILE)):
+        if os.path.exists(path):
+            os.remove(path)
+# --------------------------------------
+
+
+# --- Scheduling Helpers ---
+class DurationHistory:
+    """
+    Per-file durations collected from the run history (or, without one, from earlier
+    JSON reports in the report directory). Used to predict how long each test will
+    take so the longest ones can start first.
+    """
+    def __init__(self, report_dir=REPORT_DIR, max_reports=HISTORY_MAX_REPORTS):
+        self.report_dir = report_dir
+        self.max_reports = max_reports
+        self.durations = {}  # (type, file) -> [duration, ...] oldest first
+
+    def load(self):
+        """Read the most recent runs. Unreadable or foreign JSON files are ignored."""
+        if not os.path.isdir(self.report_dir):
+            return self
+
+        runs = HistoryStore(os.path.join(self.report_dir, HISTORY_FILE)).runs(self.max_reports)
+        if runs:
+            for run in runs:
+                self._add(run["results"])
+            return self
+
+        reports = [os.path.join(self.report_dir, f) for f in os.listdir(self.report_dir) if f.endswith(".json")]
+        reports.sort(key=os.path.getmtime)
+        for path in reports[-self.max_reports:]:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    results = json.load(f).get("results", [])
+            except (OSError, ValueError, AttributeError):
+                continue
+            self._add(results)
+        return self
+
+    def _add(self, results):
+        """Record the durations of one run's results"""
+        for r in results:
+            if isinstance(r, dict) and r.get("status") in ("SUCCESS", "FAILED", "REGRESSED") and r.get("duration") is not None:
+                self.durations.setdefault((r.get("type"), r.get("file")), []).append(float(r["duration"]))
+
+    def predict(self, file_name, test_type):
+        """Median of the recorded durations, or None for a file without history"""
+        samples = self.durations.get((test_type, file_name))
+        return statistics.median(samples) if samples else None
+
+    def default_duration(self, test_type):
+        """
+        Prediction for new files: the upper quartile of known per-file medians,
+        so that unknown (possibly heavy) files are not pushed to the end of the run.
+        """
+        known = sorted(statistics.median(v) for (t, _), v in self.durations.items() if t == test_type and v)
+        if not known:
+            return DEFAULT_TEST_DURATION
+        return known[min(len(known) - 1, (len(known) * 3) // 4)]
+
+
+_ANNOTATION_RE = re.compile(r"^(?:--+|#+)\s*@([a-z][a-z-]*)\s*(?::\s*(.*?))?\s*$")
+
+
+def _parse_annotations(file_path):
+    """
+    Reads scheduling annotations from the leading comment block of a test file:
+        --- @depends: 12_mv.sql, 13_imv.sql   (run after these files, skip if they did not succeed)
+        --- @exclusive                        (run alone, nothing else in flight)
+        --- @resource: cpu-heavy              (resource tags, limited with @max-parallel)
+        --- @max-parallel: 2                  (at most N tests holding each of this file's tags)
+        --- @fixture: parallel_data           (run in a clone of this fixture's template database)
+        --- @verify: off                      (results are not deterministic, skip answer verification)
+    Unknown markers such as '---@sql@' are ignored.
+    """
+    annotations = {"depends": [], "exclusive": False, "resources": [], "max_parallel": None, "fixtures": [], "verify": True}
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            for raw_line in f:
+                line = raw_line.strip()
+                if not line:
+                    continue
+                if not line.startswith(("--", "#")):
+                    break
+                m = _ANNOTATION_RE.match(line)
+                if not m:
+                    continue
+                key, value = m.group(1), (m.group(2) or "").strip()
+                if key == "depends":
+                    annotations["depends"].extend(v for v in re.split(r"[,\s]+", value) if v)
+                elif key == "exclusive":
+                    annotations["exclusive"] = True
+                elif key == "resource":
+                    annotations["resources"].extend(v for v in re.split(r"[,\s]+", value) if v)
+                elif key == "max-parallel" and value.isdigit() and int(value) > 0:
+                    annotations["max_parallel"] = int(value)
+                elif key == "fixture":
+                    annotations["fixtures"].extend(v for v in re.split(r"[,\s]+", value) if v)
+                elif key == "verify":
+                    annotations["verify"] = value.lower() not in ("off", "false", "no")
+    except OSError:
+        pass
+    return annotations
+
+
+class TaskScheduler:
+    """
+    Dispatches tasks to a thread pool while respecting dependencies, exclusive tasks
+    and per-resource concurrency limits. Ready tasks start in the order they were
+    given, so the caller decides priority (e.g. longest first).
+
+    A task is a dict with 'name', 'type', 'fn' (returns a result dict), 'depends',
+    'exclusive' and 'resources'. Tasks that also carry 'coro' (returns a coroutine) and
+    'loop' (an AsyncLoop) run on that event loop instead of occupying a pool thread.
+    'controllers' maps a task group ('group', by default its 'type') to a ConcurrencyController
+    whose current limit caps how many tasks of that group run at once; it is fed every finished task.
+    An exclusive task only waits for (and holds back) tasks of the same 'scope', e.g. its target;
+    tasks without one share a single scope.
+    """
+    def __init__(self, max_workers, resource_limits=None, log=None, controllers=None):
+        self.max_workers = max(1, max_workers)
+        self.resource_limits = dict(resource_limits or {})
+        self.log = log or (lambda message, **kwargs: None)
+        self.controllers = dict(controllers or {})
+
+    def _result(self, task, status, error):
+        return {"file": task["name"], "status": status, "error": error, "duration": 0.0, "type": task["type"]}
+
+    def _invoke(self, task):
+        """Run a task on a worker thread and record which worker ran it and when"""
+        started = datetime.now()
+        result = task["fn"]()
+        result["worker"] = threading.current_thread().name
+        result["start_time"] = started.isoformat(sep=" ", timespec="milliseconds")
+        result["end_time"] = datetime.now().isoformat(sep=" ", timespec="milliseconds")
+        return result
+
+    async def _invoke_async(self, task, worker):
+        """Run a task's coroutine on the event loop; 'worker' is the async slot it occupies"""
+        started = datetime.now()
+        result = await task["coro"]()
+        result["worker"] = worker
+        result["start_time"] = started.isoformat(sep=" ", timespec="milliseconds")
+        result["end_time"] = datetime.now().isoformat(sep=" ", timespec="milliseconds")
+        return result
+
+    def _find_cycles(self, tasks):
+        """Names of tasks that can never become ready because of a dependency cycle (Kahn's algorithm)"""
+        indegree = {t["name"]: len(t["depends"]) for t in tasks}
+        dependents = {}
+        for t in tasks:
+            for dep in t["depends"]:
+                dependents.setdefault(dep, []).append(t["name"])
+        ready = [name for name, degree in indegree.items() if degree == 0]
+        while ready:
+            for child in dependents.get(ready.pop(), []):
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        return {name for name, degree in indegree.items() if degree > 0}
+
+    def run(self, tasks, on_result):
+        """Run all tasks, calling on_result(result) from the calling thread as each one finishes"""
+        names = {t["name"] for t in tasks}
+        pending = []
+        for t in tasks:
+            missing = [d for d in t["depends"] if d not in names]
+            if missing:
+                self.log(f"[SCHED] {t['name']}: Dependencies not part of this run, ignored: {', '.join(missing)}")
+            pending.append(dict(t, depends=[d for d in t["depends"] if d in names]))
+
+        cyclic = self._find_cycles(pending)
+        for t in [t for t in pending if t["name"] in cyclic]:
+            pending.remove(t)
+            self.log(f"[SCHED] {t['name']}: Skipped, part of a dependency cycle", is_error=True)
+            on_result(self._result(t, "SKIPPED", "Dependency cycle detected in @depends annotations."))
+
+        finished = {}   # name -> status
+        running = {}    # future -> task
+        usage = {}      # resource -> running count
+        slots = {}      # future -> async slot number
+        free_slots = []  # heap of released async slot numbers
+        for controller in self.controllers.values():
+            controller.begin()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="worker") as executor:
+            try:
+                while pending or running:
+                    # 1. Skip tasks whose dependencies did not succeed
+                    for t in list(pending):
+                        failed = [d for d in t["depends"] if d in finished and finished[d] not in SCHEDULER_OK_STATUSES]
+                        if failed:
+                            pending.remove(t)
+                            finished[t["name"]] = "SKIPPED"
+                            on_result(self._result(t, "SKIPPED", f"Dependency did not succeed: {', '.join(failed)}"))
+
+                    # 2. Start ready tasks in priority order
+                    # Scopes running an exclusive task, or draining so that the next one can start
+                    blocked = {t.get("scope") for t in running.values() if t["exclusive"]}
+                    by_type = Counter(t.get("group", t["type"]) for t in running.values())
+                    throttled = set()  # Types with ready tasks held back by their controller
+                    for t in list(pending):
+                        if len(running) >= self.max_workers:
+                            break
+                        scope = t.get("scope")
+                        if scope in blocked or any(d not in finished for d in t["depends"]):
+                            continue
+                        group = t.get("group", t["type"])
+                        controller = self.controllers.get(group)
+                        if controller and by_type[group] >= controller.limit:
+                            throttled.add(group)
+                            continue
+                        if t["exclusive"]:
+                            blocked.add(scope)
+                            if any(r.get("scope") == scope for r in running.values()):
+                                continue  # Let the scope drain; nothing else of it starts ahead of an exclusive task
+                        elif any(usage.get(r, 0) >= self.resource_limits.get(r, self.max_workers) for r in t["resources"]):
+                            continue
+                        pending.remove(t)
+                        by_type[t.get("group", t["type"])] += 1
+                        for r in t["resources"]:
+                            usage[r] = usage.get(r, 0) + 1
+                        if t.get("coro") and t.get("loop"):
+                            slot = heapq.heappop(free_slots) if free_slots else len(slots) + 1
+                            future = t["loop"].submit(self._invoke_async(t, f"async_{slot}"))
+                            slots[future] = slot
+                        else:
+                            future = executor.submit(self._invoke, t)
+                        running[future] = t
+
+                    if not running:
+                        # Nothing could start although work remains; report it rather than spin
+                        for t in pending:
+                            on_result(self._result(t, "SKIPPED", "Could not be scheduled."))
+                        pending = []
+                        continue
+
+                    for test_type, controller in self.controllers.items():
+                        controller.note_demand(by_type[test_type], test_type in throttled)
+
+                    # 3. Collect whatever finished; controllers also need to wake up between completions
+                    timeout = min((c.interval for c in self.controllers.values()), default=None)
+                    done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        t = running.pop(future)
+                        if future in slots:
+                            heapq.heappush(free_slots, slots.pop(future))
+                        for r in t["resources"]:
+                            usage[r] -= 1
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = self._result(t, "FAILED", f"Runner error: {e}")
+                        finished[t["name"]] = result["status"]
+                        controller = self.controllers.get(t.get("group", t["type"]))
+                        if controller and result["status"] not in ("CACHED", "SKIPPED"):
+                            controller.observe(t["name"], result["duration"], t.get("unloaded"))
+                        on_result(result)
+                    for controller in self.controllers.values():
+                        controller.tick()
+            except BaseException:
+                # E.g. Ctrl-C: cancel what has not started and kill running async processes
+                for future in running:
+                    future.cancel()
+                raise
+
+
+class LatencyHistogram:
+    """
+    Log-linear (HDR-style) latency histogram. Values are recorded in microseconds into
+    buckets of 2**(SUB_BUCKET_BITS - 1) linear sub-buckets per power of two, so a percentile
+    (the upper bound of its bucket) overstates the true value by at most 1/64 (about 1.6%)
+    no matter how many samples were recorded.
+    """
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self):
+        self.counts = {}  # (shift, sub-bucket) -> count
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = max(0, int(seconds * 1_000_000))
+        shift = max(0, micros.bit_length() - self.SUB_BUCKET_BITS)
+        key = (shift, micros >> shift)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        for key, n in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, in seconds"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for shift, sub in sorted(self.counts):
+            seen += self.counts[(shift, sub)]
+            if seen >= rank:
+                return min(self.max, (((sub + 1) << shift) - 1) / 1_000_000)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "p50": round(self.percentile(50), 6),
+            "p95": round(self.percentile(95), 6),
+            "p99": round(self.percentile(99), 6),
+            "max": round(self.max, 6),
+        }
+
+
+class ConcurrencyController:
+    """
+    AIMD controller behind '--concurrency auto'. Every AUTO_CONTROL_INTERVAL seconds it looks at
+    the tests completed since the last decision (throughput, and latency inflation against each
+    file's unloaded duration: its history median, or the fastest run seen in this run) and at
+    pg_stat_activity (active sessions, lock waits, max_connections headroom). The limit grows by
+    one while the pool is saturated and healthy, and is cut by AUTO_DECREASE_FACTOR on overload.
+    pg_stat_activity is sampled on a background thread, so tick() never blocks the scheduler on a
+    slow server; decisions use the last completed sample, and a probe pending for longer than the
+    interval counts as overload.
+    """
+    def __init__(self, db_config, start=AUTO_CONCURRENCY_START, minimum=1,
+                 maximum=AUTO_CONCURRENCY_MAX, interval=AUTO_CONTROL_INTERVAL, log=None, name=None):
+        self.db_config = db_config
+        self.name = name  # Prefix of the log lines, e.g. the target when there are several
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = min(max(start, minimum), self.maximum)
+        self.start_limit = self.limit
+        self.interval = interval
+        self.log = log or (lambda message, **kwargs: None)
+        self.decisions = []
+        self._started = time.monotonic()
+        self._last = self._started
+        self._best = {}          # file -> fastest duration seen in this run
+        self._window = []        # (duration, unloaded duration or None) of completions since the last decision
+        self._saturated = False  # Tests were waiting for a free slot at the limit since the last decision
+        self._last_throughput = None
+        self._last_action = None
+        self._sample = (None, None)  # Last completed server sample and when it completed
+        self._probe_started = None   # Start of the server probe in flight, None when idle
+
+    def begin(self):
+        """Start the clock when the first tests are dispatched (after fixtures and other preparation)"""
+        self._started = self._last = time.monotonic()
+        self._start_probe()
+
+    def observe(self, file_name, duration, unloaded=None):
+        """Record a completed test; 'unloaded' is its expected duration without contention, if known"""
+        best = self._best.get(file_name)
+        self._window.append((duration, unloaded or best))
+        if best is None or duration < best:
+            self._best[file_name] = duration
+
+    def note_demand(self, running, waiting):
+        """Called by the scheduler: 'waiting' tests could not start because the limit was reached"""
+        if waiting and running >= self.limit:
+            self._saturated = True
+
+    def _server_signals(self):
+        """Active sessions, lock waits, all sessions and max_connections from pg_stat_activity, or None"""
+        return_code, out, _ = _psql_query(self.db_config, (
+            "SELECT count(*) FILTER (WHERE state = 'active'), count(*) FILTER (WHERE wait_event_type = 'Lock'), "
+            "count(*), current_setting('max_connections')::int FROM pg_stat_activity WHERE pid <> pg_backend_pid()"),
+            timeout=self.interval)
+        try:
+            active, lock_waits, sessions, max_connections = (int(v) for v in out.split("|"))
+        except ValueError:
+            return None
+        return {"active": active, "lock_waits": lock_waits, "sessions": sessions, "max_connections": max_connections} if return_code == 0 else None
+
+    def _probe(self):
+        """Background thread: one _server_signals sample"""
+        self._sample = (self._server_signals(), time.monotonic())
+        self._probe_started = None
+
+    def _start_probe(self):
+        """Start a server sample unless one is still in flight"""
+        if self._probe_started is None:
+            self._probe_started = time.monotonic()
+            threading.Thread(target=self._probe, name="auto-probe", daemon=True).start()
+
+    def tick(self):
+        """Make a decision if the interval has passed. Returns True if the limit changed."""
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            return False
+        elapsed = now - self._last
+        window, self._window = self._window, []
+        saturated, self._saturated = self._saturated, False
+        self._last = now
+
+        ratios = [d / u for d, u in window if u]
+        inflation = statistics.median(ratios) if ratios else None
+        throughput = len(window) / elapsed
+        server, _ = self._sample
+        probe_started = self._probe_started
+        self._start_probe()
+
+        reasons = []
+        if probe_started is not None and now - probe_started > self.interval:
+            reasons.append(f"server probe pending for {now - probe_started:.1f}s")
+        if server and server["lock_waits"] > max(1, self.limit // 4):
+            reasons.append(f"{server['lock_waits']} lock waits")
+        if server and server["sessions"] >= server["max_connections"] * AUTO_CONNECTION_HEADROOM:
+            reasons.append(f"{server['sessions']}/{server['max_connections']} connections")
+        if inflation is not None and inflation > AUTO_MAX_INFLATION:
+            reasons.append(f"latency inflation {inflation:.2f}")
+        if (self._last_action == "increase" and window and self._last_throughput
+                and throughput < self._last_throughput * 0.8):
+            reasons.append("throughput fell after increase")
+
+        before = self.limit
+        if reasons:
+            action = "decrease"
+            self.limit = max(self.minimum, min(self.limit - 1, int(self.limit * AUTO_DECREASE_FACTOR)))
+        elif saturated and (window or server):
+            action = "increase"
+            self.limit = min(self.maximum, self.limit + 1)
+            reasons.append("saturated and healthy")
+        else:
+            action = "hold"
+            reasons.append("not saturated" if not saturated else "no feedback yet")
+        if self.limit == before:
+            action = "hold"
+
+        decision = {
+            "t": round(now - self._started, 3),
+            "at": round(time.time(), 3),
+            "action": action,
+            "from": before,
+            "to": self.limit,
+            "reason": ", ".join(reasons),
+            "completed": len(window),
+            "throughput": round(throughput, 3),
+            "inflation": round(inflation, 3) if inflation is not None else None,
+            "server": server,
+        }
+        self.decisions.append(decision)
+        self._last_throughput = throughput if window else self._last_throughput
+        self._last_action = action
+        self.log(f"[AUTO] {self.name + ': ' if self.name else ''}t={decision['t']:.0f}s concurrency {before} -> {self.limit} ({decision['reason']}; "
+                 f"{len(window)} done, {throughput:.2f} tests/s, inflation "
+                 f"{'-' if inflation is None else f'{inflation:.2f}'}"
+                 + (f", active {server['active']}, lock waits {server['lock_waits']}, "
+                    f"connections {server['sessions']}/{server['max_connections']}" if server else ", no server signals")
+                 + ")", is_summary=action != "hold")
+        return self.limit != before
+
+    def report(self):
+        limits = [d["to"] for d in self.decisions] or [self.limit]
+        return {
+            "mode": "auto",
+            "start": self.start_limit,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "final": self.limit,
+            "peak": max(limits + [self.start_limit]),
+            "decisions": self.decisions,
+        }
+
+
+def _concurrency_arg(value):
+    """argparse type for --concurrency: a positive number or 'auto'"""
+    if value == "auto":
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number or 'auto', got '{value}'")
+
+
+def _auto_concurrency_limit(db_config, maximum, output_file_handle=None):
+    """Upper bound for '--concurrency auto': 'maximum', capped by the connections the server has free"""
+    return_code, out, error = _psql_query(db_config, (
+        "SELECT current_setting('max_connections')::int - current_setting('superuser_reserved_connections')::int "
+        "- (SELECT count(*) FROM pg_stat_activity)"), timeout=ADMIN_TIMEOUT_SECONDS)
+    if return_code != 0 or not out.strip().lstrip("-").isdigit():
+        _log(f"[AUTO] Could not read connection headroom, using --max-concurrency {maximum}: {error}",
+             output_file_handle, is_error=True, is_summary=True)
+        return maximum
+    # Keep two connections spare for isolation and fixture admin sessions
+    free = int(out) - 2
+    if free < maximum:
+        _log(f"[AUTO] Server has {int(out)} free connections, capping concurrency at {max(1, free)}",
+             output_file_handle, is_summary=True)
+    return max(1, min(maximum, free))
+
+
+def _simulate_makespan(durations, workers):
+    """Makespan of greedy list scheduling: each duration goes to the first worker that becomes free"""
+    finish_times = [0.0] * max(1, workers)
+    for d in durations:
+        heapq.heappush(finish_times, heapq.heappop(finish_times) + d)
+    return max(finish_times)
+# --------------------------------------
+
+
+# --- Multi-Target Helpers ---
+def _parse_target(spec, default_port, default_dbname):
+    """'host[:port][/dbname]' from --target or a --targets-file line. Returns (host, port, dbname) or None."""
+    m = re.match(r"^([^:/\s]+)(?::(\d+))?(?:/(\S+))?$", spec.strip())
+    if not m:
+        return None
+    return m.group(1), int(m.group(2)) if m.group(2) else default_port, m.group(3) or default_dbname
+
+
+def _read_targets_file(path):
+    """Target specs from a file, one per line; blank lines and '#' comments are ignored"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+
+
+def _target_label(db_config):
+    return f"{db_config['host']}:{db_config['port']}/{db_config['dbname']}"
+
+
+def _pg_env(db_config):
+    """Environment for Shell tests: libpq variables pointing at their target, so a plain 'psql' reaches it"""
+    env = os.environ.copy()
+    env.update(PGHOST=db_config["host"], PGPORT=str(db_config["port"]), PGUSER=db_config["user"],
+               PGPASSWORD=db_config["password"], PGDATABASE=db_config["dbname"])
+    return env
+
+
+def _shard_files(files, predicted, shards):
+    """
+    Splits test files across 'shards' targets. Files linked by @depends or sharing a @fixture set
+    form one group that stays on one target (dependencies are only scheduled within a target, and a
+    fixture is built once per target that needs it). Groups are placed longest predicted first on
+    the target with the least predicted work (LPT). 'files' is a list of (file_path, file_name);
+    returns (one set of file names per target, predicted seconds per target).
+    """
+    parent = {fname: fname for _, fname in files}
+
+    def find(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    fixture_owner = {}
+    for fpath, fname in files:
+        annotations = _parse_annotations(fpath)
+        links = [d for d in annotations["depends"] if d in parent]
+        if annotations["fixtures"]:
+            links.append(fixture_owner.setdefault(tuple(annotations["fixtures"]), fname))
+        for other in links:
+            parent[find(other)] = find(fname)
+
+    groups = {}
+    for _, fname in files:
+        groups.setdefault(find(fname), []).append(fname)
+    loads = [(0.0, index) for index in range(shards)]
+    assignment = [set() for _ in range(shards)]
+    work = [0.0] * shards
+    for names in sorted(groups.values(), key=lambda names: (-sum(predicted[n] for n in names), names[0])):
+        load, index = heapq.heappop(loads)
+        assignment[index].update(names)
+        work[index] = load + sum(predicted[n] for n in names)
+        heapq.heappush(loads, (work[index], index))
+    return assignment, work
+
+
+def _target_breakdown(results):
+    """Per-target counts, busy time and first start/last end of a run's results"""
+    targets = {}
+    for r in results:
+        t = targets.setdefault(r.get("target") or "-", {
+            "total": 0, "success": 0, "failed": 0, "skipped": 0, "regressed": 0, "cached": 0,
+            "busy_time": 0.0, "start_time": None, "end_time": None})
+        t["total"] += 1
+        if r["status"].lower() in t:
+            t[r["status"].lower()] += 1
+        t["busy_time"] += r.get("duration") or 0.0
+        if r.get("start_time") and (t["start_time"] is None or r["start_time"] < t["start_time"]):
+            t["start_time"] = r["start_time"]
+        if r.get("end_time") and (t["end_time"] is None or r["end_time"] > t["end_time"]):
+            t["end_time"] = r["end_time"]
+    for t in targets.values():
+        t["busy_time"] = round(t["busy_time"], 3)
+        t["makespan"] = round((datetime.fromisoformat(t["end_time"]) - datetime.fromisoformat(t["start_time"])).total_seconds(), 3) \
+            if t["start_time"] and t["end_time"] else None
+    return targets
+# --------------------------------------
+
+
+# --- Timeline and Trace Export ---
+def _worker_key(name):
+    """Sorts worker names naturally ('worker_2' before 'worker_10')"""
+    prefix, _, number = name.rpartition("_")
+    return (prefix, int(number)) if number.isdigit() else (name, -1)
+
+
+def _result_window(result):
+    """(start, end) of a result in epoch seconds, widened to cover its recorded spans, or None"""
+    if not result.get("worker") or not result.get("start_time") or not result.get("end_time"):
+        return None
+    start = datetime.fromisoformat(result["start_time"]).timestamp()
+    end = datetime.fromisoformat(result["end_time"]).timestamp()
+    # start_time/end_time only have millisecond precision
+    for _, span_start, span_end in result.get("spans") or []:
+        start, end = min(start, span_start), max(end, span_end)
+    return start, end
+
+
+def _utilization_timeline(results, start_time, end_time):
+    """Busy and idle time of every worker over the run, with the offset/duration/status of each test it ran"""
+    origin = start_time.timestamp()
+    makespan = max((end_time - start_time).total_seconds(), 0.0)
+    workers = {}
+    for r in results:
+        window = _result_window(r)
+        if window is None:
+            continue
+        worker = workers.setdefault(r["worker"], {"name": r["worker"], "tests": 0, "busy": 0.0, "spans": []})
+        worker["tests"] += 1
+        worker["busy"] += window[1] - window[0]
+        worker["spans"].append([round(window[0] - origin, 3), round(window[1] - window[0], 3), r["status"], r["file"]])
+    lanes = []
+    for name in sorted(workers, key=_worker_key):
+        worker = workers[name]
+        worker["spans"].sort()
+        if len(worker["spans"]) > TIMELINE_MAX_SPANS:
+            worker["spans"] = _merge_spans(worker["spans"], makespan / TIMELINE_MAX_SPANS)
+        worker["idle"] = round(max(makespan - worker["busy"], 0.0), 3)
+        worker["utilization"] = round(worker["busy"] / makespan, 4) if makespan > 0 else 0.0
+        worker["busy"] = round(worker["busy"], 3)
+        lanes.append(worker)
+    busy = sum(w["busy"] for w in lanes)
+    return {"makespan": round(makespan, 3), "busy": round(busy, 3),
+            "idle": round(max(makespan * len(lanes) - busy, 0.0), 3),
+            "utilization": round(busy / (makespan * len(lanes)), 4) if lanes and makespan > 0 else 0.0,
+            "workers": lanes}
+
+
+def _merge_spans(spans, resolution):
+    """Merges [offset, duration, status, file] spans less than 'resolution' seconds apart (a failure wins the status)"""
+    merged = []
+    for offset, duration, status, name in spans:
+        last = merged[-1] if merged else None
+        if last is not None and offset - (last[0] + last[1]) < resolution:
+            last[1] = round(max(last[0] + last[1], offset + duration) - last[0], 3)
+            last[2] = status if status in ("FAILED", "REGRESSED") else last[2]
+            last[4] += 1
+            last[3] = f"{last[4]} tests"
+        else:
+            merged.append([offset, duration, status, name, 1])
+    return [span[:4] for span in merged]
+
+
+def _chrome_trace(results, start_time, fixture_spans=(), controls=()):
+    """
+    Trace Event Format (chrome://tracing, ui.perfetto.dev) of a run: one lane per worker with a span
+    per test and nested spans for its phases (spawn, connect, isolation setup, ...) and statements,
+    a lane for fixture builds, and counters for running tests and the '--concurrency auto' limit.
+    'controls' are (name, concurrency_control report) pairs.
+    """
+    origin = start_time.timestamp()
+
+    def us(t):
+        return max(int(round((t - origin) * 1e6)), 0)
+
+    windows = [(r, _result_window(r)) for r in results]
+    windows = [(r, w) for r, w in windows if w is not None]
+    lanes = {name: tid for tid, name in enumerate(sorted({r["worker"] for r, _ in windows}, key=_worker_key), start=1)}
+    events = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "cbdb-test-runner"}}]
+    for name, tid in lanes.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+        events.append({"name": "thread_sort_index", "ph": "M", "pid": 1, "tid": tid, "args": {"sort_index": tid}})
+
+    edges = []
+    for r, (start, end) in windows:
+        tid = lanes[r["worker"]]
+        args = {"status": r["status"], "type": r["type"], "duration": r.get("duration")}
+        for key in ("target", "predicted"):
+            if r.get(key) is not None:
+                args[key] = r[key]
+        if r.get("error"):
+            args["error"] = str(r["error"])[:500]
+        events.append({"name": r["file"], "cat": "test", "ph": "X", "pid": 1, "tid": tid,
+                       "ts": us(start), "dur": max(us(end) - us(start), 1), "args": args})
+        edges += [(start, 1), (end, -1)]
+        execute = None
+        for name, span_start, span_end in r.get("spans") or []:
+            events.append({"name": name, "cat": "phase", "ph": "X", "pid": 1, "tid": tid,
+                           "ts": us(span_start), "dur": max(us(span_end) - us(span_start), 1)})
+            if name == "execute":
+                execute = span_start
+        if execute is None:
+            continue
+        # Statement end times are offsets from the start of the execute span
+        for stmt in r.get("statements") or []:
+            if stmt.get("finished_at") is None or stmt.get("duration") is None:
+                continue
+            stmt_end = execute + stmt["finished_at"]
+            args = {"text": stmt.get("text", "")[:200], "rows": stmt.get("rows")}
+            if stmt.get("error"):
+                args["error"] = stmt["error"]
+            events.append({"name": f"#{stmt['index']} (line {stmt['line']})", "cat": "statement", "ph": "X", "pid": 1,
+                           "tid": tid, "ts": us(stmt_end - stmt["duration"]), "dur": max(int(stmt["duration"] * 1e6), 1),
+                           "args": args})
+
+    if fixture_spans:
+        tid = len(lanes) + 1
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": "fixtures"}})
+        events.append({"name": "thread_sort_index", "ph": "M", "pid": 1, "tid": tid, "args": {"sort_index": tid}})
+        for name, span_start, span_end in fixture_spans:
+            events.append({"name": name, "cat": "fixture", "ph": "X", "pid": 1, "tid": tid,
+                           "ts": us(span_start), "dur": max(us(span_end) - us(span_start), 1)})
+
+    running = 0
+    for t, delta in sorted(edges):
+        running += delta
+        events.append({"name": "running tests", "ph": "C", "pid": 1, "tid": 0, "ts": us(t), "args": {"tests": running}})
+    for name, control in controls:
+        if control and control.get("mode") == "auto":
+            events.append({"name": f"concurrency limit{' ' + name if name else ''}", "ph": "C", "pid": 1, "tid": 0,
+                           "ts": 0, "args": {"limit": control["start"]}})
+            for decision in control["decisions"]:
+                if decision.get("at") is not None:
+                    events.append({"name": f"concurrency limit{' ' + name if name else ''}", "ph": "C", "pid": 1, "tid": 0,
+                                   "ts": us(decision["at"]), "args": {"limit": decision["to"]}})
+
+    return {"traceEvents": events, "displayTimeUnit": "ms",
+            "otherData": {"start_time": str(start_time), "tests": len(windows)}}
+# --------------------------------------
+
+
+# --- Report Aggregates ---
+def _result_brief(result, position):
+    """A result as listed on the summary page; 'position' locates it on the detail pages"""
+    brief = {"position": position, "file": result.get("file"), "type": result.get("type"),
+             "status": result.get("status"), "duration": result.get("duration") or 0.0}
+    if result.get("target"):
+        brief["target"] = result["target"]
+    if result.get("error"):
+        brief["error"] = str(result["error"])[:300]
+    return brief
+
+
+def _aggregate_results(results):
+    """
+    Statistics the HTML summary is rendered from, so its size does not grow with the run: a duration
+    histogram, the slowest and the failing tests and, when files ran more than once (merged reports,
+    load streams), per-file counts and duration percentiles.
+    """
+    histogram = [0] * (len(REPORT_DURATION_BUCKETS) + 1)
+    per_file = {}
+    failing, failing_total = [], 0
+    for position, r in enumerate(results):
+        duration = r.get("duration") or 0.0
+        histogram[bisect.bisect_left(REPORT_DURATION_BUCKETS, duration)] += 1
+        per_file.setdefault(r.get("file"), []).append((duration, r.get("status")))
+        if r.get("status") in ("FAILED", "REGRESSED"):
+            failing_total += 1
+            if len(failing) < REPORT_FAILED_MAX:
+                failing.append(_result_brief(r, position))
+
+    labels = [f"< {bound:g}s" for bound in REPORT_DURATION_BUCKETS] + [f">= {REPORT_DURATION_BUCKETS[-1]:g}s"]
+    slowest = heapq.nlargest(REPORT_TOP_TESTS, range(len(results)), key=lambda i: results[i].get("duration") or 0.0)
+    aggregates = {
+        "histogram": [{"label": label, "count": count} for label, count in zip(labels, histogram)],
+        "slowest": [_result_brief(results[i], i) for i in slowest],
+        "failing": failing,
+        "failing_total": failing_total,
+    }
+    if len(per_file) < len(results):
+        files = {}
+        for name, runs in per_file.items():
+            durations = sorted(d for d, _ in runs)
+            files[name] = {
+                "count": len(runs),
+                "failed": sum(1 for _, status in runs if status in ("FAILED", "REGRESSED")),
+                "total": round(sum(durations), 3),
+                "p50": round(durations[(len(durations) - 1) // 2], 3),
+                "p95": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 3),
+                "max": round(durations[-1], 3),
+            }
+        aggregates["per_file"] = dict(sorted(files.items(), key=lambda item: -item[1]["total"]))
+    return aggregates
+# --------------------------------------
+
+
 class BaseTestRunner:
-    """Base class for test runners to handle common functionality like reporting."""
+    """
+    Base class for test runners to handle common functionality like reporting.
+    Subclasses implement _get_files() and _execute_test(); run() schedules the files
+    through a TaskScheduler, and prepare()/finish() let UnifiedTestRunner share one scheduler.
+    """
+    summary_tag = "TEST"
+
     def __init__(self, report_json_path, report_html_path, output_file_handle=None):
         self.results = []
         self.output_file_handle = output_file_handle
         self.report_json = report_json_path
         self.report_html = report_html_path
+        self.test_type = None
+        self.concurrency = 1
+        self.schedule = "lpt"
+        self.history = None
+        self.predicted = {}
+        self.resource_limits = {}
+        self.controller = None  # ConcurrencyController for '--concurrency auto'; self.concurrency is then its maximum
+        self.target = None      # 'host:port/dbname' when the suite is spread over several targets ('--target')
+        self.shard = None       # Names of the files this runner runs; None runs all of them
+        self.result_stream = None  # ResultStream that gets every result as soon as it is collected
+        self._measured = set()  # Files whose prediction comes from history rather than the default
+        self.schedule_stats = None
+        self.async_loop = None  # Set by runners whose tests run as coroutines ('--engine async')
+        self.keep_output_logs = True  # '--load' runs the same file many times at once and keeps no per-test logs
+        self.result_cache = None      # ResultCache: keys are computed for every test when set
+        self.changed_only = False     # Report tests whose key passed before as CACHED instead of running them
+        self._cache_keys = {}
+        self._files = []
+        # Per-test output goes to <report>_logs/<file>.log through the run's LogWriter
+        self.log_writer = getattr(output_file_handle, "writer", None)
+        self.test_log_dir = os.path.splitext(report_json_path)[0] + "_logs"
+
+    @property
+    def label(self):
+        """Test type, plus the target when the suite is spread over several ('--target')"""
+        return f"{self.test_type} @ {self.target}" if self.target else self.test_type
 
     def _print_log(self, message, is_error=False, is_summary=False):
         _log(message, self.output_file_handle, is_error, is_summary)
 
-    def _generate_reports(self, start_time, end_time):
-        """Generate both JSON and HTML reports"""
+    def _open_capture(self, file_name, ignored_pattern=None):
+        """Start streaming one execution of a test into its per-test log"""
+        if not self.keep_output_logs:
+            return OutputCapture(_NullLogWriter(), None, file_name, ignored_pattern)
+        if self.log_writer is None:
+            self.log_writer = LogWriter()
+        log_path = os.path.join(self.test_log_dir, f"{file_name}.log")
+        return OutputCapture(self.log_writer, log_path, file_name, ignored_pattern)
+
+    def run(self):
+        """Run all files with this runner's own scheduler"""
+        start_time = datetime.now()
+        tasks, limits = self.prepare()
+        try:
+            if tasks:
+                if limits:
+                    self._print_log(f"[SCHED] Resource limits: {limits}")
+                controllers = {self.test_type: self.controller} if self.controller else None
+                TaskScheduler(self.concurrency, limits, log=self._print_log, controllers=controllers).run(
+                    tasks, self._on_result)
+        finally:
+            self.finish()
+        end_time = datetime.now()
+        self.schedule_stats = self._schedule_stats(start_time, end_time)
+        return start_time, end_time, self.results
+
+    def prepare(self):
+        """Discover and order files. Returns (tasks, resource_limits) for the scheduler."""
+        files = self._get_files()
+        if self.shard is not None:
+            files = [f for f in files if f[1] in self.shard]
+        self._files = self._order_files(files)
+        return self._build_tasks(self._files)
+
+    def finish(self):
+        """Release resources held for the run"""
+
+    def _order_files(self, files):
+        """Predict each file's duration from history and order files for dispatch (longest first for 'lpt')"""
+        if not files:
+            return files
+
+        history = self.history if self.history is not None else DurationHistory().load()
+        default = history.default_duration(self.test_type)
+        for _, fname in files:
+            predicted = history.predict(fname, self.test_type)
+            self.predicted[fname] = default if predicted is None else predicted
+            if predicted is not None:
+                self._measured.add(fname)
+
+        if self.schedule == "lpt":
+            # sorted() is stable, so files with equal predictions keep their name order
+            files = sorted(files, key=lambda f: -self.predicted[f[1]])
+            self._print_log("[SCHED] Dispatch order (longest first): " + ", ".join(
+                f"{fname} ({self.predicted[fname]:.2f}s)" for _, fname in files))
+        return files
+
+    def _build_tasks(self, files):
+        """Turn files into scheduler tasks using their header annotations"""
+        tasks = []
+        limits = {}
+        for fpath, fname in files:
+            annotations = _parse_annotations(fpath)
+            if annotations["max_parallel"]:
+                if not annotations["resources"]:
+                    self._print_log(f"[SCHED] {fname}: @max-parallel without @resource has no effect.")
+                for r in annotations["resources"]:
+                    limits[r] = min(limits.get(r, annotations["max_parallel"]), annotations["max_parallel"])
+            if annotations["depends"] or annotations["exclusive"] or annotations["resources"]:
+                self._print_log(f"[SCHED] {fname}: depends={annotations['depends']} exclusive={annotations['exclusive']} "
+                                f"resources={annotations['resources']}")
+            tasks.append({
+                "name": fname,
+                "type": self.test_type,
+                "fn": functools.partial(self._execute_test, fpath, fname),
+                "depends": annotations["depends"],
+                "exclusive": annotations["exclusive"],
+                "resources": annotations["resources"],
+                "predicted": self.predicted.get(fname, 0.0),
+                "unloaded": self.predicted[fname] if fname in self._measured else None,
+            })
+            if self.async_loop is not None:
+                tasks[-1]["coro"] = functools.partial(self._execute_test_async, fpath, fname)
+                tasks[-1]["loop"] = self.async_loop
+        limits.update(self.resource_limits)
+        if self.result_cache is not None:
+            self._apply_cache(tasks, dict((fname, fpath) for fpath, fname in files))
+        return tasks, limits
+
+    def _cache_config(self):
+        """Runner settings that can change a test's outcome (part of its cache key)"""
+        return {}
+
+    def _cache_inputs(self, file_name):
+        """Further inputs of one test's cache key besides its file and dependencies"""
+        return []
+
+    def _apply_cache(self, tasks, paths):
+        """Compute each task's cache key (dependencies first); with changed_only, replace cache hits by CACHED results"""
+        by_name = {t["name"]: t for t in tasks}
+        config = self._cache_config()
+
+        def key_of(name, visiting=()):
+            if name not in self._cache_keys:
+                if name in visiting:
+                    return None  # Dependency cycle; the scheduler skips these anyway
+                deps = [key_of(d, visiting + (name,)) if d in by_name else d for d in by_name[name]["depends"]]
+                deps += self._cache_inputs(name)
+                self._cache_keys[name] = self.result_cache.key(self.test_type, paths[name], config, deps)
+            return self._cache_keys[name]
+
+        cached = 0
+        for t in tasks:
+            entry = self.result_cache.lookup(self.test_type, t["name"], key_of(t["name"]))
+            if entry is None or not self.changed_only:
+                continue
+            result = {
+                "file": t["name"], "status": "CACHED", "duration": 0.0, "type": self.test_type,
+                "error": None, "cached": {"run": entry.get("run"), "duration": entry.get("duration")},
+            }
+            # Nothing to run: no exclusivity or resources to hold, and no coroutine
+            t.update(fn=functools.partial(dict, result), exclusive=False, resources=[], cached=True)
+            t.pop("coro", None)
+            cached += 1
+        if self.changed_only:
+            self._print_log(f"[CACHE] {self.test_type}: {cached} of {len(tasks)} tests unchanged since they last passed", is_summary=True)
+
+    def _on_result(self, result):
+        """Collect a finished result and print its one-line console summary"""
+        file_name = result['file']
+        result["predicted_duration"] = round(self.predicted.get(file_name, 0.0), 3)
+
+        if file_name in self._cache_keys:
+            result["cache_key"] = self._cache_keys[file_name]
+        if self.target:
+            result["target"] = self.target
+
+        label = {"SUCCESS": "OK", "FAILED": "FAIL", "SKIPPED": "SKIP"}.get(result["status"], result["status"])
+        self._print_log(f"[{self.summary_tag} {label}] {file_name} ({result['duration']:.3f}s)",
+                        is_error=result["status"] not in ("SUCCESS", "CACHED"), is_summary=True)
+        # The detailed failure message is already in the file log from _execute_test
+
+        self.results.append(result)
+        if self.result_stream is not None:
+            self.result_stream.write(result)
+
+    def _schedule_stats(self, start_time, end_time):
+        """Compare the predicted makespan of the dispatch order with what actually happened"""
+        if not self._files:
+            return None
+
+        workers = min(self.controller.report()["peak"] if self.controller else self.concurrency, len(self._files))
+        predicted_makespan = _simulate_makespan([self.predicted[fname] for _, fname in self._files], workers)
+        actual_makespan = (end_time - start_time).total_seconds()
+        busy_time = sum(r["duration"] for r in self.results)
+        utilization = busy_time / (workers * actual_makespan) if actual_makespan > 0 else 0.0
+
+        self._print_log(
+            f"[SCHED] {self.label}: Predicted makespan: {predicted_makespan:.3f}s, actual: {actual_makespan:.3f}s, "
+            f"worker utilization: {utilization:.1%}", is_summary=True)
+
+        return {
+            "policy": self.schedule,
+            "workers": workers,
+            "predicted_makespan": round(predicted_makespan, 3),
+            "actual_makespan": round(actual_makespan, 3),
+            "busy_time": round(busy_time, 3),
+            "worker_utilization": round(utilization, 4),
+            "order": [fname for _, fname in self._files],
+            "concurrency_control": self.controller.report() if self.controller else None,
+        }
+
+    def _generate_reports(self, start_time, end_time, extra=None):
+        """Generate both JSON and HTML reports. 'extra' adds top-level sections (e.g. schedule stats)."""
         
         self._print_log("\n--- Generating Reports ---") 
         
@@ -69,6 +2325,8 @@ class BaseTestRunner:
             "success": sum(1 for r in self.results if r["status"] == "SUCCESS"),
             "failed": sum(1 for r in self.results if r["status"] == "FAILED"),
             "skipped": sum(1 for r in self.results if r["status"] == "SKIPPED"), 
+            "regressed": sum(1 for r in self.results if r["status"] == "REGRESSED"),
+            "cached": sum(1 for r in self.results if r["status"] == "CACHED"),
         }
 
         report_data = {
@@ -76,13 +2334,16 @@ class BaseTestRunner:
             "end_time": str(end_time),
             "duration": str(end_time - start_time),
             "summary": summary,
+            "aggregates": _aggregate_results(self.results),
             "results": self.results,
         }
+        if extra:
+            report_data.update(extra)
 
-        # Save JSON report
+        # Save JSON report (pretty-printed while it is small enough to be read by eye)
         try:
             with open(self.report_json, "w", encoding="utf-8") as f:
-                json.dump(report_data, f, indent=4, ensure_ascii=False)
+                json.dump(report_data, f, indent=4 if len(self.results) <= REPORT_PAGE_SIZE else None, ensure_ascii=False)
             self._print_log(f"[INFO] JSON report saved to {self.report_json}")
         except Exception as e:
             self._print_log(f"[ERROR] Failed to save JSON report to {self.report_json}: {e}", is_error=True)
@@ -102,30 +2363,268 @@ class BaseTestRunner:
             return
 
         try:
-            env = Environment(loader=FileSystemLoader(template_dir))
+            # Statement text, output and error messages may contain <, & or </code>
+            env = Environment(loader=FileSystemLoader(template_dir), autoescape=select_autoescape(["html"]))
             template = env.get_template("report_template.html")
-            html_content = template.render(report=report_data)
+
+            # Beyond one page the summary shows only aggregates; the results go to numbered detail pages
+            results = report_data["results"]
+            pages = []
+            if len(results) > REPORT_PAGE_SIZE:
+                page_dir = os.path.splitext(self.report_html)[0] + "_pages"
+                os.makedirs(page_dir, exist_ok=True)
+                for offset in range(0, len(results), REPORT_PAGE_SIZE):
+                    name = f"results_{offset // REPORT_PAGE_SIZE + 1:04d}.html"
+                    pages.append({"file": f"{os.path.basename(page_dir)}/{name}", "name": name,
+                                  "first": offset + 1, "last": min(offset + REPORT_PAGE_SIZE, len(results))})
 
             with open(self.report_html, "w", encoding="utf-8") as f:
-                f.write(html_content)
+                f.write(template.render(report=report_data, pages=pages, page_size=REPORT_PAGE_SIZE, page=None))
+            for number, page in enumerate(pages):
+                page = dict(page, number=number + 1, summary=os.path.basename(self.report_html),
+                            results=results[page["first"] - 1:page["last"]],
+                            previous=pages[number - 1]["name"] if number > 0 else None,
+                            next=pages[number + 1]["name"] if number + 1 < len(pages) else None)
+                with open(os.path.join(page_dir, page["name"]), "w", encoding="utf-8") as f:
+                    f.write(template.render(report=report_data, pages=pages, page_size=REPORT_PAGE_SIZE, page=page))
+            if pages:
+                self._print_log(f"[INFO] {len(results)} results on {len(pages)} detail pages in {page_dir}")
         except Exception as e:
              self._print_log(f"[ERROR] Failed to render HTML report: {e}", is_error=True)
 
 
+class ConnectionPool:
+    """
+    Keeps one long-lived libpq connection per worker thread (used by '--engine pool').
+    Connections are opened lazily and reset with DISCARD ALL between files.
+    """
+    def __init__(self, db_config):
+        self.db_config = db_config
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def connect(self, dbname=None):
+        """Open a new connection outside the pool (e.g. to a test's private database)."""
+        conn = psycopg2.connect(
+            host=self.db_config['host'],
+            port=self.db_config['port'],
+            user=self.db_config['user'],
+            password=self.db_config['password'],
+            dbname=dbname or self.db_config['dbname'],
+            application_name="cbdb-test-runner",
+        )
+        conn.autocommit = True  # Same as psql: every statement commits on its own
+        return conn
+
+    def get(self):
+        """Return the calling worker's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def release(self, conn):
+        """Reset session state after a file. Broken connections are dropped and reopened on next use."""
+        try:
+            if not conn.closed:
+                with conn.cursor() as cur:
+                    if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                        cur.execute("ROLLBACK")
+                    cur.execute("DISCARD ALL")
+                del conn.notices[:]
+                return
+        except psycopg2.Error:
+            pass
+        self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self._local.conn = None
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except psycopg2.Error:
+                    pass
+            self._connections = []
+
+
 class SQLTestRunner(BaseTestRunner):
     """
     Executes SQL files using 'psql -f' command via subprocess.
     Supports parallel execution using ThreadPoolExecutor.
+    With engine='pool', statements run over persistent libpq connections instead,
+    falling back to 'psql -f' for files that contain psql meta-commands.
+    With isolation='schema' or 'database', every file runs in its own schema
+    (via search_path) or database (cloned from a template), dropped afterwards.
+    Files that declare '@fixture' always run in a database cloned from the fixture's
+    template database, which is built once from <sql_dir>/fixtures/<name>.sql.
     """
-    def __init__(self, db_config, sql_dir, specific_file, report_json_path, report_html_path, output_file_handle, concurrency):
+    summary_tag = "SQL"
+
+    def __init__(self, db_config, sql_dir, specific_file, report_json_path, report_html_path, output_file_handle, concurrency, engine="psql",
+                 schedule="lpt", history=None, isolation="none", isolation_template="template1", resource_limits=None):
         super().__init__(report_json_path, report_html_path, output_file_handle)
         self.db_config = db_config
         self.sql_dir = sql_dir
-        self.specific_file = specific_file 
+        self.specific_file = specific_file
         self.test_type = "SQL (psql)"
         self.concurrency = concurrency # <--- NEW: Concurrency level
+        self.engine = engine
+        self.pool = None
+        self.schedule = schedule
+        self.history = history
+        self.isolation = isolation
+        self.isolation_template = isolation_template
+        self._run_token = uuid.uuid4().hex[:8]  # Keeps names unique across concurrent runner processes
+        self._isolation_seq = 0
+        self._isolation_lock = threading.Lock()
+        self.fixture_dir = os.path.join(sql_dir, "fixtures")
+        self.drop_stale_fixtures = False  # Drop templates of other definitions of a rebuilt fixture set ('--drop-stale-fixtures')
+        self._fixture_targets = {}  # file -> template database of its fixtures
+        self._fixture_sets = {}     # template database -> fixture names
+        self.fixture_spans = []     # [name, start, end] of template databases built by this run
+        self._fixture_keys = {}     # file -> hash of its fixture definitions
+        self._fixture_errors = {}   # file -> why its fixtures are unavailable
+        self._extension_files = set()  # files creating extensions, isolated per database even with 'schema'
+        self.resource_limits = dict(resource_limits or {})  # Explicit limits, override @max-parallel
+        self.server_stats = False   # Snapshot server counters around every test ('--server-stats')
+        self._stat_view = "pg_stat_database"
+        self.answer_mode = None     # 'record' or 'verify' ('--record-answers' / '--verify-answers')
+        self.answer_index = os.path.join(sql_dir, ANSWER_DIR, ANSWER_INDEX_FILE)
+        self._expected_answers = {} # file -> recorded answers ('verify')
+        self._recorded_answers = {} # file -> answers of this run ('record')
+        self._verify_off = set()    # files annotated '@verify: off'
         # Ignores "ERROR: role "XXX" does not exist"
-        self.IGNORED_ERROR_MESSAGE_PATTERN = "ERROR:  role \".*\" does not exist" 
+        self.IGNORED_ERROR_MESSAGE_PATTERN = "ERROR:  role \".*\" does not exist"
+
+    def _cache_config(self):
+        return {
+            "target": {k: v for k, v in self.db_config.items() if k != "password"},
+            "engine": self.engine,
+            "isolation": self.isolation,
+            "isolation_template": self.isolation_template,
+            "ignored_errors": self.IGNORED_ERROR_MESSAGE_PATTERN,
+            "verify_answers": self.answer_mode == "verify",
+        }
+
+    def _cache_inputs(self, file_name):
+        inputs = [self._fixture_keys[file_name]] if file_name in self._fixture_keys else []
+        if self.answer_mode == "verify" and file_name in self._expected_answers:
+            # Re-recorded answers must be verified again
+            inputs.append(hashlib.sha1(json.dumps(self._expected_answers[file_name], sort_keys=True).encode("utf-8")).hexdigest())
+        return inputs
+
+    def _build_tasks(self, files):
+        self._resolve_fixtures(files)
+        if self.isolation == "schema":
+            self._extension_files = {fname for fpath, fname in files if _creates_extension(fpath)}
+            for fname in sorted(self._extension_files):
+                self._print_log(f"[ISOLATION] {fname}: Creates extensions, runs in its own database instead of a schema")
+        if self.answer_mode:
+            self._verify_off = {fname for fpath, fname in files if not _parse_annotations(fpath)["verify"]}
+        if self.answer_mode == "verify":
+            self._expected_answers = _load_answer_index(self.answer_index)["files"]
+            if not self._expected_answers and os.path.exists(self.answer_index):
+                self._print_log(f"[ANSWER WARN] {self.answer_index} has no answers of this runner version "
+                                f"(version {ANSWER_INDEX_VERSION}); record them again with --record-answers", is_error=True, is_summary=True)
+        return super()._build_tasks(files)
+
+    def _resolve_fixtures(self, files):
+        """Map files declaring '@fixture' to the template database of their fixture definitions"""
+        for fpath, fname in files:
+            names = _parse_annotations(fpath)["fixtures"]
+            if not names:
+                continue
+            digest = hashlib.sha256(self.isolation_template.encode("utf-8"))
+            missing = []
+            for name in names:
+                try:
+                    with open(os.path.join(self.fixture_dir, f"{name}.sql"), "rb") as f:
+                        digest.update(name.encode("utf-8") + b"\0" + f.read() + b"\0")
+                except OSError:
+                    missing.append(name)
+            if missing:
+                self._fixture_errors[fname] = f"Unknown fixture(s) {', '.join(missing)} (expected in {self.fixture_dir})"
+                continue
+            key = digest.hexdigest()
+            template = _fixture_db_name(names, key)
+            self._fixture_keys[fname] = key
+            self._fixture_targets[fname] = template
+            self._fixture_sets[template] = names
+
+    def _build_fixtures(self, tasks):
+        """Make sure the template database of every fixture set needed by this run exists"""
+        needed = {}
+        for t in tasks:
+            template = self._fixture_targets.get(t["name"])
+            if template and not t.get("cached"):
+                needed.setdefault(template, []).append(t["name"])
+        for template, file_names in needed.items():
+            error = self._ensure_fixture(template, self._fixture_sets[template])
+            if error:
+                self._print_log(f"[FIXTURE FAIL] {template}: {error}", is_error=True, is_summary=True)
+                for fname in file_names:
+                    self._fixture_errors[fname] = f"Fixture {', '.join(self._fixture_sets[template])} unavailable: {error.splitlines()[0]}"
+
+    def _ensure_fixture(self, template, names):
+        """Reuse the template database if it exists, otherwise build it under a temporary name and rename it. Returns an error or None."""
+        return_code, exists, error = _psql_query(self.db_config, f"SELECT 1 FROM pg_database WHERE datname = '{template}'")
+        if return_code != 0:
+            return error or f"psql exited with code {return_code}"
+        if exists == "1":
+            self._print_log(f"[FIXTURE] {', '.join(names)}: Reusing template database {template}", is_summary=True)
+            return None
+
+        start = time.monotonic()
+        started = time.time()
+        building = f"{template}_tmp{uuid.uuid4().hex[:6]}"
+        return_code, _, error = _psql_query(
+            self.db_config, f'CREATE DATABASE "{building}" TEMPLATE "{self.isolation_template}"')
+        if return_code != 0:
+            return error or f"psql exited with code {return_code}"
+        for name in names:
+            return_code, _, error = _psql_script(self.db_config, os.path.join(self.fixture_dir, f"{name}.sql"), building)
+            if return_code != 0:
+                _psql_query(self.db_config, f'DROP DATABASE IF EXISTS "{building}"')
+                return f"{name}.sql failed: {error or f'psql exited with code {return_code}'}"
+
+        # Tests clone the template, which fails while anybody is connected to it
+        _psql_query(self.db_config, f'ALTER DATABASE "{building}" WITH ALLOW_CONNECTIONS false')
+        return_code, _, error = _psql_query(self.db_config, f'ALTER DATABASE "{building}" RENAME TO "{template}"')
+        if return_code != 0:
+            # Most likely another runner finished the same fixture first
+            _psql_query(self.db_config, f'DROP DATABASE IF EXISTS "{building}"')
+            return_code, exists, _ = _psql_query(self.db_config, f"SELECT 1 FROM pg_database WHERE datname = '{template}'")
+            return None if exists == "1" else error
+        self._print_log(f"[FIXTURE] {', '.join(names)}: Built template database {template} "
+                        f"in {time.monotonic() - start:.1f}s", is_summary=True)
+        self.fixture_spans.append(_span(f"fixture {', '.join(names)}", started, time.time()))
+
+        # Templates of other definitions of the same fixture set may belong to a concurrent run of another
+        # branch or --sql-dir (nobody stays connected to a template), so they are only dropped on request
+        if not self.drop_stale_fixtures:
+            return None
+        stem = template[:-9]
+        return_code, stale, _ = _psql_query(
+            self.db_config, f"SELECT datname FROM pg_database WHERE datname ~ '^{stem}_[0-9a-f]{{8}}$' AND datname <> '{template}'")
+        for old in stale.splitlines() if return_code == 0 else []:
+            return_code, _, error = _psql_query(self.db_config, f'DROP DATABASE IF EXISTS "{old}"')
+            if return_code == 0:
+                self._print_log(f"[FIXTURE] Dropped outdated template database {old}")
+        return None
 
     def _get_files(self):
         """List all SQL files or the specific file sorted by name"""
@@ -147,12 +2646,217 @@ class SQLTestRunner(BaseTestRunner):
         return [(os.path.join(self.sql_dir, f), f) for f in files]
 
     def _execute_test(self, file_path, file_name):
-        """Execute a single SQL file using psql -f (designed to run in a thread)"""
+        """Execute a single SQL file with the configured engine (designed to run in a thread)"""
+        if file_name in self._fixture_errors:
+            return self._setup_failed(file_name, datetime.now(), self._fixture_errors[file_name])
+        if self.isolation == "none" and file_name not in self._fixture_targets:
+            return self._execute_measured(file_path, file_name, None)
+
         start = datetime.now()
-        
-        # Log to file, but do not summarize to console immediately
-        self._print_log(f"\n--- Executing SQL File (psql -f): {file_name} ---")
+        target, sql = self._isolation_setup_sql(file_name)
+        mode = target["mode"]
+        target, setup_error = self._isolation_created(file_name, target, _psql_query(self.db_config, sql))
+        if setup_error:
+            return self._setup_failed(file_name, start, f"Isolation setup failed ({mode}): {setup_error.splitlines()[0]}")
+        setup_span = _span("isolation_setup", start.timestamp(), time.time())
+
+        try:
+            result = self._execute_measured(file_path, file_name, target)
+        finally:
+            cleanup_started = time.time()
+            self._isolation_dropped(file_name, target, _psql_query(self.db_config, self._isolation_cleanup_sql(target)))
+        result["isolation"] = target
+        result["spans"] = [setup_span] + result.get("spans", []) + [_span("isolation_cleanup", cleanup_started, time.time())]
+        return result
+
+    async def _execute_test_async(self, file_path, file_name):
+        """Coroutine version of _execute_test for '--engine async' (runs on the event loop)"""
+        if file_name in self._fixture_errors:
+            return self._setup_failed(file_name, datetime.now(), self._fixture_errors[file_name])
+        target = None
+        if self.isolation != "none" or file_name in self._fixture_targets:
+            start = datetime.now()
+            target, sql = self._isolation_setup_sql(file_name)
+            mode = target["mode"]
+            target, setup_error = self._isolation_created(file_name, target, await _psql_query_async(self.db_config, sql))
+            if setup_error:
+                return self._setup_failed(file_name, start, f"Isolation setup failed ({mode}): {setup_error.splitlines()[0]}")
+            setup_span = _span("isolation_setup", start.timestamp(), time.time())
+
+        try:
+            result = await self._execute_measured_async(file_path, file_name, target)
+        finally:
+            if target:
+                cleanup_started = time.time()
+                sql = self._isolation_cleanup_sql(target)
+                self._isolation_dropped(file_name, target, await _psql_query_async(self.db_config, sql))
+        if target:
+            result["isolation"] = target
+            result["spans"] = [setup_span] + result.get("spans", []) + [_span("isolation_cleanup", cleanup_started, time.time())]
+        return result
+
+    def _stats_scope(self, target):
+        """Database whose counters cover a test, and whether they are the test's alone"""
+        if target and target["mode"] == "database":
+            return target["name"], "database"
+        return self.db_config["dbname"], "shared"
+
+    def _execute_measured(self, file_path, file_name, target):
+        """_execute_with_engine between two counter snapshots of the test's database ('--server-stats')"""
+        if not self.server_stats:
+            return self._execute_with_engine(file_path, file_name, target)
+        dbname, attribution = self._stats_scope(target)
+        started = time.time()
+        before = _psql_query(self.db_config, _stat_snapshot_sql(self._stat_view, dbname))
+        snapshot_span = _span("stats_snapshot", started, time.time())
+        result = self._execute_with_engine(file_path, file_name, target)
+        started = time.time()
+        after = _psql_query(self.db_config, _stat_snapshot_sql(self._stat_view, dbname, settle=attribution == "database"))
+        result["server_stats"] = _server_stats(dbname, attribution, before, after)
+        if attribution == "database":
+            result["server_stats"]["settle_seconds"] = round(time.time() - started, 3)
+        result["spans"] = [snapshot_span] + result.get("spans", []) + [_span("stats_snapshot", started, time.time())]
+        return result
+
+    async def _execute_measured_async(self, file_path, file_name, target):
+        """Coroutine version of _execute_measured"""
+        statements = _read_statements(file_path)
+        if not self.server_stats:
+            return await self._execute_test_psql_async(file_path, file_name, target, statements)
+        dbname, attribution = self._stats_scope(target)
+        started = time.time()
+        before = await _psql_query_async(self.db_config, _stat_snapshot_sql(self._stat_view, dbname))
+        snapshot_span = _span("stats_snapshot", started, time.time())
+        result = await self._execute_test_psql_async(file_path, file_name, target, statements)
+        started = time.time()
+        after = await _psql_query_async(
+            self.db_config, _stat_snapshot_sql(self._stat_view, dbname, settle=attribution == "database"))
+        result["server_stats"] = _server_stats(dbname, attribution, before, after)
+        if attribution == "database":
+            result["server_stats"]["settle_seconds"] = round(time.time() - started, 3)
+        result["spans"] = [snapshot_span] + result.get("spans", []) + [_span("stats_snapshot", started, time.time())]
+        return result
+
+    def stats_summary(self):
+        """
+        Totals and the heaviest tests by temp spill, blocks read and tuples written ('--server-stats').
+        Shared deltas also get the number of other tests that ran at the same time.
+        """
+        measured = [r for r in self.results if r.get("server_stats") and "error" not in r["server_stats"]]
+        shared = [r for r in measured if r["server_stats"]["attribution"] == "shared" and r.get("start_time")]
+        starts = sorted(r["start_time"] for r in shared)
+        ends = sorted(r["end_time"] for r in shared)
+        for r in shared:
+            # Overlapping = all others minus those that started after this one ended or ended before it started
+            later = len(starts) - bisect.bisect_left(starts, r["end_time"])
+            earlier = bisect.bisect_right(ends, r["start_time"])
+            r["server_stats"]["concurrent_tests"] = len(shared) - 1 - later - earlier
+
+        def top(key):
+            ranked = sorted(measured, key=lambda r: -r["server_stats"][key])[:SERVER_STATS_TOP]
+            return [{"file": r["file"], key: r["server_stats"][key]} for r in ranked if r["server_stats"][key] > 0]
+
+        summary = {
+            "view": self._stat_view,
+            "measured": len(measured),
+            "shared": len(shared),
+            "errors": sum(1 for r in self.results if "error" in (r.get("server_stats") or {})),
+            # Worker time spent waiting for private databases' counters to settle
+            "settle_seconds": round(sum(r["server_stats"].get("settle_seconds", 0) for r in measured), 3),
+            "totals": {k: sum(r["server_stats"][k] for r in measured) for k in SERVER_STAT_COUNTERS},
+            "top_temp_bytes": top("temp_bytes"),
+            "top_blks_read": top("blks_read"),
+            "top_tup_written": top("tup_written"),
+        }
+        if summary["top_temp_bytes"]:
+            self._print_log("[STATS] Most temp spill: " + ", ".join(
+                f"{t['file']} ({t['temp_bytes'] / 1048576:.1f} MB)" for t in summary["top_temp_bytes"]), is_summary=True)
+        if summary["errors"]:
+            self._print_log(f"[STATS] Counters could not be read for {summary['errors']} test(s)", is_error=True, is_summary=True)
+        return summary
+
+    def _setup_failed(self, file_name, start, reason):
+        """Result for a file that could not be run because its isolation or fixture setup failed"""
+        self._print_log(f"[SQL FAIL] {file_name}: {reason}", is_error=True)
+        return {
+            "file": file_name,
+            "status": "FAILED",
+            "error": reason,
+            "duration": (datetime.now() - start).total_seconds(),
+            "type": self.test_type
+        }
+
+    def _isolation_setup_sql(self, file_name):
+        """Name the private schema/database for one execution. Returns (target, create statement)."""
+        with self._isolation_lock:
+            self._isolation_seq += 1
+            seq = self._isolation_seq
+        name = _isolation_name(self._run_token, seq, file_name)
+        fixture = self._fixture_targets.get(file_name)
+        # A fixture needs its own database, whatever the isolation mode. So does CREATE EXTENSION: in a
+        # private schema the extension would be dropped with it, from under concurrent runs that share it.
+        target = {"mode": "database" if fixture or file_name in self._extension_files else self.isolation, "name": name}
+        if fixture:
+            target["fixture"] = fixture
+
+        if target["mode"] == "schema":
+            return target, f'CREATE SCHEMA "{name}"'
+        return target, f'CREATE DATABASE "{name}" TEMPLATE "{fixture or self.isolation_template}"'
+
+    def _isolation_created(self, file_name, target, query_result):
+        """Check the (return_code, stdout, stderr) of the create statement. Returns (target, error)."""
+        return_code, _, error = query_result
+        if return_code != 0:
+            return None, error or f"psql exited with code {return_code}"
+        self._print_log(f"[ISOLATION] {file_name}: Created {target['mode']} {target['name']}")
+        return target, None
+
+    def _isolation_cleanup_sql(self, target):
+        if target["mode"] == "schema":
+            return f'DROP SCHEMA IF EXISTS "{target["name"]}" CASCADE'
+        return f'DROP DATABASE IF EXISTS "{target["name"]}"'
+
+    def _isolation_dropped(self, file_name, target, query_result):
+        """Warn if the drop statement failed; the run goes on"""
+        return_code, _, error = query_result
+        if return_code != 0:
+            self._print_log(f"[ISOLATION WARN] {file_name}: Failed to drop {target['mode']} {target['name']}: {error}", is_error=True)
+
+    def _execute_with_engine(self, file_path, file_name, target):
+        """Run the file with the configured engine, in the isolation target if one is given"""
+        statements = _read_statements(file_path)
+        if self.engine == "pool":
+            if statements is None:
+                self._print_log(f"[SQL WARN] {file_name}: Could not parse file for pool engine. Falling back to psql.")
+            elif any(s["meta"] for s in statements):
+                self._print_log(f"[INFO] {file_name}: Contains psql meta-commands. Falling back to psql -f.")
+            else:
+                return self._execute_test_pool(file_path, file_name, statements, target)
+
+        return self._execute_test_psql(file_path, file_name, target, statements)
+
+    def _evaluate_exit(self, file_name, return_code, capture):
+        """Map an exit code and the captured stderr to (status, error_message), honoring IGNORED_ERROR_MESSAGE_PATTERN"""
+        if return_code == 0:
+            return "SUCCESS", None
+
+        # The capture matched IGNORED_ERROR_MESSAGE_PATTERN against every stderr line while streaming
+        is_ignorable_error = capture.ignored_error_seen
+
+        if is_ignorable_error:
+            self._print_log(f"[SQL WARN] {file_name}: Finished with ignored errors. Status: SUCCESS.", is_error=False, is_summary=False)
+            return "SUCCESS", f"Execution successful with ignored error(s). Exit Code: {return_code}. Check log for details."
 
+        return "FAILED", f"psql execution failed. Exit Code: {return_code}. Error: {capture.first_errors[0] if capture.first_errors else 'Unknown error.'}"
+
+    def _log_output(self, capture, return_code):
+        self._print_log(f"psql output (STDOUT/STDERR) streamed to: {capture.log_path}", is_error=False, is_summary=False)
+        if capture.first_errors:
+            self._print_log("psql STDERR (first lines):\n" + "\n".join(capture.first_errors), is_error=True, is_summary=False)
+        self._print_log(f"Execution Return Code: {return_code}", is_error=False, is_summary=False)
+
+    def _psql_invocation(self, file_path, target):
+        """psql command line and environment for one file (with \\timing on for per-statement results)"""
         # 1. Build the psql command
         psql_command = [
             'psql',
@@ -161,7 +2865,8 @@ class SQLTestRunner(BaseTestRunner):
             '-h', self.db_config['host'],
             '-p', str(self.db_config['port']),
             '-U', self.db_config['user'],
-            '-d', self.db_config['dbname'], 
+            '-d', target["name"] if target and target["mode"] == "database" else self.db_config['dbname'], 
+            '-c', '\\timing on',
             '-f', file_path,
             '-w', 
         ]
@@ -169,115 +2874,325 @@ class SQLTestRunner(BaseTestRunner):
         # 2. Set PGPASSWORD environment variable
         env = os.environ.copy()
         env['PGPASSWORD'] = self.db_config['password']
+        if target and target["mode"] == "schema":
+            # Unqualified names resolve to (and are created in) the test's private schema
+            env['PGOPTIONS'] = f"{env.get('PGOPTIONS', '')} -c search_path={target['name']},public".strip()
+        return psql_command, env
+
+    def _psql_capture(self, file_name, statements):
+        """Open the output capture for one execution, with a statement tracker if the file could be split"""
+        capture = self._open_capture(file_name, self.IGNORED_ERROR_MESSAGE_PATTERN)
+        tracker = None
+        if statements is not None:
+            tracker = StatementTracker(statements, answers=self.answer_mode is not None)
+            capture.listeners.append(tracker)
+        return capture, tracker
+
+    def _execute_test_psql(self, file_path, file_name, target=None, statements=None):
+        """Execute a single SQL file using psql -f"""
+        start = datetime.now()
+        
+        # Log to file, but do not summarize to console immediately
+        self._print_log(f"\n--- Executing SQL File (psql -f): {file_name} ---")
 
+        psql_command, env = self._psql_invocation(file_path, target)
         status = "SUCCESS"
         error_message = None
-        psql_output = ""
-        psql_error = ""
         return_code = 0
+        capture, tracker = self._psql_capture(file_name, statements)
 
         try:
-            # 3. Execute psql command
-            result = subprocess.run(
-                psql_command,
-                check=False, 
-                capture_output=True,
-                text=True,
-                env=env,
-                timeout=600 
-            )
-            
-            psql_output = result.stdout.strip()
-            psql_error = result.stderr.strip()
-            return_code = result.returncode
+            # 3. Execute psql command, streaming its output to the per-test log
+            return_code = _run_streaming(psql_command, capture, env=env, timeout=SQL_TIMEOUT_SECONDS)
 
             # 4. Check exit code and error messages
-            if return_code != 0:
-                is_ignorable_error = False
-                if psql_error:
-                    if re.search(self.IGNORED_ERROR_MESSAGE_PATTERN, psql_error, re.IGNORECASE):
-                        is_ignorable_error = True
-                        
-                if is_ignorable_error:
-                    status = "SUCCESS"
-                    error_message = f"Execution successful with ignored error(s). Exit Code: {return_code}. Check log for details."
-                    self._print_log(f"[SQL WARN] {file_name}: Finished with ignored errors. Status: SUCCESS.", is_error=False, is_summary=False)
-                else:
-                    status = "FAILED"
-                    error_message = f"psql execution failed. Exit Code: {return_code}. Error: {psql_error.splitlines()[0] if psql_error else 'Unknown error.'}"
+            status, error_message = self._evaluate_exit(file_name, return_code, capture)
+
+        except subprocess.TimeoutExpired:
+            status = "FAILED"
+            error_message = f"psql execution timed out after {SQL_TIMEOUT_SECONDS} seconds."
+        except Exception as e:
+            status = "FAILED"
+            error_message = f"Execution subprocess error: {str(e)}"
+        finally:
+            capture.close()
+
+        return self._psql_result(file_name, start, status, error_message, return_code, capture, tracker)
+
+    async def _execute_test_psql_async(self, file_path, file_name, target=None, statements=None):
+        """Execute a single SQL file using psql -f as an asyncio subprocess ('--engine async')"""
+        start = datetime.now()
+        self._print_log(f"\n--- Executing SQL File (psql -f, async): {file_name} ---")
+
+        psql_command, env = self._psql_invocation(file_path, target)
+        status = "SUCCESS"
+        error_message = None
+        return_code = 0
+        capture, tracker = self._psql_capture(file_name, statements)
 
+        try:
+            return_code = await _run_streaming_async(psql_command, capture, env=env, timeout=SQL_TIMEOUT_SECONDS)
+            status, error_message = self._evaluate_exit(file_name, return_code, capture)
         except subprocess.TimeoutExpired:
             status = "FAILED"
-            error_message = "psql execution timed out after 600 seconds."
+            error_message = f"psql execution timed out after {SQL_TIMEOUT_SECONDS} seconds."
         except Exception as e:
             status = "FAILED"
             error_message = f"Execution subprocess error: {str(e)}"
+        finally:
+            capture.close()
+
+        return self._psql_result(file_name, start, status, error_message, return_code, capture, tracker)
 
+    def _psql_result(self, file_name, start, status, error_message, return_code, capture, tracker):
+        """Log the execution details and build the result dictionary"""
         duration = (datetime.now() - start).total_seconds()
+        if capture.spawned and capture.first_output:
+            # psql prints nothing before it has connected ('Timing is on.' comes first)
+            capture.span("connect", capture.spawned, capture.first_output)
         
         # 5. Log details
-        self._print_log(f"psql STDOUT:\n{psql_output}", is_error=False, is_summary=False)
-        self._print_log(f"psql STDERR:\n{psql_error}", is_error=True, is_summary=False)
-        self._print_log(f"Execution Return Code: {return_code}", is_error=False, is_summary=False)
+        self._log_output(capture, return_code)
         
         # Return the result dictionary for collection
-        return {
+        result = {
             "file": file_name, 
             "status": status, 
             "error": error_message, 
             "duration": duration, 
             "type": self.test_type
         }
+        result.update(capture.summary())
+        if tracker is not None:
+            result["statements"] = tracker.results
+        self._apply_answers(result, tracker, capture, "psql")
+        return result
+
+    def _apply_answers(self, result, tracker, capture, engine):
+        """
+        '--record-answers' keeps the answers of a passing file for the answer index; '--verify-answers'
+        compares them with the recorded ones (by statement) and fails the file on a mismatch, with a diff
+        next to its log. Answers are engine specific: the pool engine formats values differently than psql.
+        """
+        if not self.answer_mode:
+            return
+        file_name = result["file"]
+        if file_name in self._verify_off:
+            result["answers"] = {"verify": "off"}
+            return
+        if tracker is None:
+            result["answers"] = {"error": "File could not be split into statements"}
+            return
+        answers = tracker.answers()
+        if self.answer_mode == "record":
+            if result["status"] == "SUCCESS":
+                self._recorded_answers[file_name] = {"engine": engine, "statements": [_stored_answer(a) for a in answers]}
+                result["answers"] = {"recorded": len(answers)}
+            return
+
+        expected = self._expected_answers.get(file_name)
+        if expected is None or expected.get("engine") != engine:
+            reason = "No recorded answers" if expected is None else f"Answers were recorded with the {expected.get('engine')} engine"
+            result["answers"] = {"verified": 0, "unverified": len(answers), "error": reason}
+            return
+        by_key = {entry["key"]: entry for entry in expected.get("statements", [])}
+        mismatches = [(by_key[a["key"]], a) for a in answers if a["key"] in by_key and by_key[a["key"]]["hash"] != a["hash"]]
+        verified = sum(1 for a in answers if a["key"] in by_key)
+        result["answers"] = {"verified": verified, "unverified": len(answers) - verified, "mismatched": len(mismatches)}
+        if not mismatches:
+            return
 
+        diff_path = os.path.splitext(capture.log_path)[0] + ".diff" if capture.log_path else None
+        if diff_path:
+            try:
+                with open(diff_path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(_answer_diff(mismatches)) + "\n")
+            except OSError as e:
+                self._print_log(f"[WARNING] Could not write answer diff {diff_path}: {e}", is_error=True)
+                diff_path = None
+        result["answers"]["diff"] = diff_path
+        result["answers"]["statements"] = [
+            {"index": a["index"], "line": a["line"], "expected_rows": e["rows"], "rows": a["rows"]} for e, a in mismatches]
+        where = ", ".join(f"#{a['index']} (line {a['line']})" for _, a in mismatches[:5]) + (", ..." if len(mismatches) > 5 else "")
+        self._print_log(f"[ANSWER] {file_name}: {len(mismatches)} statement(s) differ from the recorded answers: {where}"
+                        + (f", diff: {diff_path}" if diff_path else ""), is_error=True, is_summary=True)
+        if result["status"] == "SUCCESS":
+            result["status"] = "FAILED"
+            result["error"] = f"Wrong results in {len(mismatches)} statement(s): {where}"
 
-    def run(self):
-        """Main SQL logic with concurrent execution"""
+    def save_answers(self):
+        """Merge the answers recorded by this run into the answer index ('--record-answers')"""
+        if self.answer_mode != "record" or not self._recorded_answers:
+            return
+        index = _load_answer_index(self.answer_index)
+        index["files"].update(self._recorded_answers)
+        try:
+            os.makedirs(os.path.dirname(self.answer_index), exist_ok=True)
+            tmp_path = f"{self.answer_index}.tmp{os.getpid()}"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=1, ensure_ascii=False, sort_keys=True)
+            os.replace(tmp_path, self.answer_index)
+            self._print_log(f"[ANSWER] Recorded the answers of {len(self._recorded_answers)} file(s) in {self.answer_index}", is_summary=True)
+        except OSError as e:
+            self._print_log(f"[ERROR] Could not write the answer index {self.answer_index}: {e}", is_error=True, is_summary=True)
+
+    def _execute_test_pool(self, file_path, file_name, statements, target=None):
+        """Execute a single SQL file statement by statement over the worker's pooled connection"""
+        start = datetime.now()
+        self._print_log(f"\n--- Executing SQL File (pool): {file_name} ---")
+
+        return_code = 0
+        timed_out = threading.Event()
+        capture = self._open_capture(file_name, self.IGNORED_ERROR_MESSAGE_PATTERN)
+        tracker = StatementTracker(statements, answers=self.answer_mode is not None)
+        capture.listeners.append(tracker)
+
+        # A private database needs its own connection; everything else uses the worker's pooled one
+        transient = target is not None and target["mode"] == "database"
+        connect_started = time.time()
+        try:
+            conn = self.pool.connect(target["name"]) if transient else self.pool.get()
+            capture.span("connect", connect_started, time.time())
+            if target and target["mode"] == "schema":
+                with conn.cursor() as cur:
+                    cur.execute(f'SET search_path TO "{target["name"]}", public')
+        except psycopg2.Error as e:
+            conn = None
+            return_code = 2  # Same exit code psql uses for a failed connection
+            capture.feed("stderr", f"psql: error: {str(e).strip()}")
+
+        if conn is not None:
+            def _cancel():
+                timed_out.set()
+                conn.cancel()
+
+            timer = threading.Timer(SQL_TIMEOUT_SECONDS, _cancel)
+            timer.start()
+            try:
+                for stmt in statements:
+                    if timed_out.is_set():
+                        break
+                    for line in stmt["text"].splitlines():
+                        capture.feed("stdout", line)
+                    stmt_start = time.perf_counter()
+                    if stmt["text"] == ";":
+                        capture.feed("stdout", "Time: 0.000 ms")
+                        continue  # Empty query, e.g. from ';;'
+                    try:
+                        with conn.cursor() as cur:
+                            cur.execute(stmt["text"])
+                            for line in _format_cursor_result(cur):
+                                capture.feed("stdout", line)
+                    except psycopg2.Error as e:
+                        # Like psql without ON_ERROR_STOP: report the error and carry on
+                        message = f"psql:{file_path}:{stmt['end_line']}: {(e.pgerror or str(e)).strip()}"
+                        for line in message.splitlines():
+                            capture.feed("stderr", line)
+                        if conn.closed:
+                            return_code = 2
+                            break
+                    finally:
+                        for notice in conn.notices:
+                            capture.feed("stderr", f"psql:{file_path}:{stmt['end_line']}: {notice.strip()}")
+                        del conn.notices[:]
+                        # Same line psql prints with \\timing on; the tracker picks it up
+                        capture.feed("stdout", f"Time: {(time.perf_counter() - stmt_start) * 1000.0:.3f} ms")
+            finally:
+                timer.cancel()
+                if transient:
+                    conn.close()
+                else:
+                    self.pool.release(conn)
+
+        capture.close()
+
+        if timed_out.is_set():
+            status = "FAILED"
+            error_message = f"Pool execution timed out after {SQL_TIMEOUT_SECONDS} seconds."
+        else:
+            status, error_message = self._evaluate_exit(file_name, return_code, capture)
+
+        duration = (datetime.now() - start).total_seconds()
+        self._log_output(capture, return_code)
+
+        result = {
+            "file": file_name,
+            "status": status,
+            "error": error_message,
+            "duration": duration,
+            "type": self.test_type
+        }
+        result.update(capture.summary())
+        result["statements"] = tracker.results
+        self._apply_answers(result, tracker, capture, "pool")
+        return result
+
+    def prepare(self):
+        """Main SQL logic: discover files and set up the engine for concurrent execution"""
         self._print_log("\n=== Cloudberry SQL Test Runner (psql -f) ===")
         self._print_log(f"SQL directory: {self.sql_dir}")
         self._print_log(f"Concurrency level: {self.concurrency}") # <--- NEW: Log concurrency
+        self._print_log(f"Execution engine: {self.engine}")
+        self._print_log(f"Schedule policy: {self.schedule}")
 
-        files = self._get_files()
-        
-        start_time = datetime.now()
-        
-        if not files:
+        if self.engine == "async":
+            # Tasks built by prepare() run as coroutines on this loop
+            self.async_loop = AsyncLoop()
+        tasks, limits = super().prepare()
+        if not tasks:
             self._print_log(f"[INFO] No SQL files found to execute.")
-            return start_time, datetime.now(), self.results
-
-        # Use ThreadPoolExecutor for concurrent execution
-        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
-            future_to_file = {
-                executor.submit(self._execute_test, fpath, fname): fname
-                for fpath, fname in files
-            }
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_file):
-                result = future.result()
-                file_name = result['file']
-                
-                # 7. Print summary to console for completed task
-                if result["status"] == "SUCCESS":
-                    self._print_log(f"[SQL OK] {file_name} ({result['duration']:.3f}s)", is_summary=True)
-                else:
-                    self._print_log(f"[SQL FAIL] {file_name} ({result['duration']:.3f}s)", is_error=True, is_summary=True)
-                    # The detailed failure message is already in the file log from _execute_test
+            return tasks, limits
+        self._build_fixtures(tasks)
+        if self.server_stats:
+            self._probe_stat_view()
+        if self.engine == "pool":
+            self.pool = ConnectionPool(self.db_config)
+        return tasks, limits
 
-                self.results.append(result)
+    def _probe_stat_view(self):
+        """Use the per-segment gp_stat_database view where the server has it"""
+        return_code, out, _ = _psql_query(self.db_config, "SELECT to_regclass('gp_stat_database') IS NOT NULL")
+        self._stat_view = "gp_stat_database" if return_code == 0 and out == "t" else "pg_stat_database"
+        self._print_log(f"[STATS] Server counters per test from {self._stat_view}", is_summary=True)
+        if self.isolation != "database":
+            self._print_log(f"[STATS] Tests without a database of their own share the counters of "
+                            f"'{self.db_config['dbname']}' with concurrent tests (attribution 'shared'); "
+                            "use --isolation database for per-test numbers", is_summary=True)
 
-        end_time = datetime.now()
-        return start_time, end_time, self.results 
+    def finish(self):
+        if self.pool is not None:
+            self.pool.close_all()
+            self.pool = None
+        if self.async_loop is not None:
+            self.async_loop.close()
+            self.async_loop = None
 
 
 class ShellTestRunner(BaseTestRunner):
     """
     Executes Shell scripts using bash via subprocess.
+    Scripts run sequentially unless a higher concurrency is given.
     """
-    def __init__(self, bash_dir, specific_file, report_json_path, report_html_path, output_file_handle):
+    summary_tag = "BASH"
+
+    def __init__(self, bash_dir, specific_file, report_json_path, report_html_path, output_file_handle, concurrency=1,
+                 schedule="lpt", history=None, env=None):
         super().__init__(report_json_path, report_html_path, output_file_handle)
         self.bash_dir = bash_dir
         self.specific_file = specific_file 
         self.test_type = "SHELL"
+        self.concurrency = concurrency
+        self.schedule = schedule
+        self.history = history
+        self.env = env  # Environment of the scripts, e.g. PGHOST/PGPORT of their target (see _pg_env)
+
+    def _cache_config(self):
+        # Scripts reach their cluster through the libpq variables, and their tools through PATH
+        env = self.env if self.env is not None else os.environ
+        return {
+            "target": {k: v for k, v in sorted(env.items()) if k.startswith("PG") and k != "PGPASSWORD"},
+            "path": env.get("PATH", ""),
+        }
 
     def _get_files(self):
         """List all Shell files (.sh) or the specific file sorted by name"""
@@ -289,17 +3204,17 @@ class ShellTestRunner(BaseTestRunner):
             fpath = os.path.join(self.bash_dir, self.specific_file)
             if os.path.isfile(fpath) and fpath.endswith(".sh"):
                 self._print_log(f"[INFO] Executing specified Shell file: {self.specific_file}")
-                return [fpath]
+                return [(fpath, os.path.basename(fpath))]
             else:
                 self._print_log(f"[ERROR] Specified Shell file '{self.specific_file}' not found or is not a .sh file in '{self.bash_dir}'.", is_error=True)
                 return []
 
         files = [f for f in os.listdir(self.bash_dir) if f.endswith(".sh")]
         files.sort()
-        return [os.path.join(self.bash_dir, f) for f in files]
+        return [(os.path.join(self.bash_dir, f), f) for f in files]
 
     def _execute_test(self, file_path, file_name):
-        """Execute a single Shell script"""
+        """Execute a single Shell script (designed to run in a thread)"""
         start = datetime.now()
         
         self._print_log(f"\n--- Executing SHELL: {file_name} ---")
@@ -310,91 +3225,643 @@ class ShellTestRunner(BaseTestRunner):
             error_message = "Execution permission denied. Use 'chmod +x' on the file."
             
             self._print_log(f"[BASH SKIP] {file_name}: {error_message}", is_error=True) 
-            self._print_log(f"[BASH SKIP] {file_name} ({duration:.3f}s)", is_error=True, is_summary=True)
 
-            self.results.append({
+            return {
                 "file": file_name, "status": "SKIPPED", "error": error_message,
                 "duration": duration, "type": self.test_type
-            })
-            return
+            }
 
+        capture = self._open_capture(file_name)
         try:
-            # Execute script using bash
-            result = subprocess.run(
-                ['bash', file_path],
-                check=True, # Raises CalledProcessError on non-zero exit code
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
+            # Execute script using bash, streaming its output to the per-test log
+            return_code = _run_streaming(['bash', file_path], capture, env=self.env, timeout=300)
             duration = (datetime.now() - start).total_seconds()
-            
-            # Detailed log to file
-            self._print_log(f"Script STDOUT:\n{result.stdout.strip()}")
-            self._print_log(f"Script STDERR:\n{result.stderr.strip()}")
-            
-            # Summary output to console
-            self._print_log(f"[BASH OK] {file_name} ({duration:.3f}s)", is_summary=True)
-
-            self.results.append({
-                "file": file_name, "status": "SUCCESS", "error": None,
-                "duration": duration, "type": self.test_type
-            })
 
-        except subprocess.CalledProcessError as e:
-            duration = (datetime.now() - start).total_seconds()
-            error_msg = f"Exit Code {e.returncode}. Stderr: {e.stderr.strip()}"
-            
             # Detailed log to file
-            self._print_log(f"Script STDOUT:\n{e.stdout.strip()}")
-            self._print_log(f"[BASH FAIL] {file_name}: Execution failed. {error_msg}", is_error=True)
+            self._print_log(f"Script output (STDOUT/STDERR) streamed to: {capture.log_path}")
 
-            # Summary output to console
-            self._print_log(f"[BASH FAIL] {file_name} ({duration:.3f}s)", is_error=True, is_summary=True)
-
-            self.results.append({
-                "file": file_name, "status": "FAILED", "error": error_msg,
-                "duration": duration, "type": self.test_type
-            })
+            if return_code == 0:
+                status, error_msg = "SUCCESS", None
+            else:
+                status = "FAILED"
+                error_msg = f"Exit Code {return_code}. Stderr: {' '.join(line.strip() for line in capture.first_errors)}"
+                self._print_log(f"[BASH FAIL] {file_name}: Execution failed. {error_msg}", is_error=True)
 
         except (subprocess.TimeoutExpired, Exception) as e:
             duration = (datetime.now() - start).total_seconds()
+            status = "FAILED"
             error_msg = str(e)
             
             # Detailed log to file
             self._print_log(f"[BASH FAIL] {file_name}: Error: {error_msg}", is_error=True)
+        finally:
+            capture.close()
 
-            # Summary output to console
-            self._print_log(f"[BASH FAIL] {file_name} ({duration:.3f}s)", is_error=True, is_summary=True)
+        result = {
+            "file": file_name, "status": status, "error": error_msg,
+            "duration": duration, "type": self.test_type
+        }
+        result.update(capture.summary())
+        return result
 
-            self.results.append({
-                "file": file_name, "status": "FAILED", "error": error_msg,
-                "duration": duration, "type": self.test_type
-            })
-        
-    def run(self):
-        """Main Shell logic (Sequential execution)"""
+    def prepare(self):
+        """Main Shell logic: discover scripts"""
         self._print_log("\n=== Shell Script Test Runner ===")
         self._print_log(f"Shell directory: {self.bash_dir}")
+        self._print_log(f"Concurrency level: {self.concurrency}")
+        return super().prepare()
 
-        files = self._get_files()
-        
+
+class UnifiedTestRunner(BaseTestRunner):
+    """
+    Runs several runners (e.g. SQL and Shell) through one shared TaskScheduler.
+    Each runner's tests are tagged with a 'type:<TYPE>' resource limited to that
+    runner's concurrency, so both kinds of tests run side by side. Runners of
+    different targets ('--target') get their resource tags suffixed with '@<target>',
+    as resource limits are per cluster, and their target as scope, so '@exclusive'
+    only keeps the file's own cluster free.
+    """
+    def __init__(self, runners, report_json_path, report_html_path, output_file_handle=None):
+        super().__init__(report_json_path, report_html_path, output_file_handle)
+        self.runners = runners
+
+    def run(self):
         start_time = datetime.now()
-        for fpath in files:
-            self._execute_test(fpath, os.path.basename(fpath))
-        
+        tasks = []
+        limits = {}
+        owners = {}
+        try:
+            for runner in self.runners:
+                runner_tasks, runner_limits = runner.prepare()
+                suffix = f"@{runner.target}" if runner.target else ""
+                type_tag = f"type:{runner.test_type}{suffix}"
+                limits.update({f"{r}{suffix}": n for r, n in runner_limits.items()})
+                limits[type_tag] = runner.concurrency
+                for task in runner_tasks:
+                    task["resources"] = [f"{r}{suffix}" for r in task["resources"]] + [type_tag]
+                    task["group"] = runner.label
+                    task["scope"] = runner.target
+                    owners[(task["type"], task["name"])] = runner
+                tasks.extend(runner_tasks)
+
+            if tasks:
+                if all(runner.schedule == "lpt" for runner in self.runners):
+                    # One queue for all types: longest predicted tests first, regardless of type
+                    tasks.sort(key=lambda t: -t["predicted"])
+                workers = sum(runner.concurrency for runner in self.runners)
+                self._print_log(f"\n=== Unified Scheduler: {len(tasks)} tests, {workers} workers ===")
+                self._print_log(f"[SCHED] Resource limits: {limits}")
+                controllers = {r.label: r.controller for r in self.runners if r.controller}
+                for label, controller in controllers.items():
+                    self._print_log(f"[AUTO] {label}: Adaptive concurrency, starting at {controller.limit} "
+                                    f"(range {controller.minimum}-{controller.maximum})", is_summary=True)
+                TaskScheduler(workers, limits, log=self._print_log, controllers=controllers).run(
+                    tasks, lambda result: owners[(result["type"], result["file"])]._on_result(result))
+        finally:
+            for runner in self.runners:
+                runner.finish()
+
         end_time = datetime.now()
+        for runner in self.runners:
+            runner.schedule_stats = runner._schedule_stats(start_time, end_time)
+            self.results.extend(runner.results)
         return start_time, end_time, self.results
 
 
+class LoadRunner:
+    """
+    '--load' mode: keeps the SQL runner's concurrency busy with a weighted random mix of its
+    files for a duration or a number of executions, and reports throughput plus per-file
+    latency percentiles. Dependencies and exclusivity annotations do not apply here.
+    """
+    def __init__(self, sql_runner, duration=None, iterations=None, weights=None,
+                 interval=LOAD_INTERVAL_SECONDS, seed=None):
+        self.runner = sql_runner
+        self.duration = duration
+        self.iterations = iterations
+        self.weights = dict(weights or {})
+        self.interval = interval
+        self.random = random.Random(seed)
+
+    def _submit(self, executor, fpath, fname):
+        if self.runner.async_loop is not None:
+            return self.runner.async_loop.submit(self.runner._execute_test_async(fpath, fname))
+        return executor.submit(self.runner._execute_test, fpath, fname)
+
+    def run(self):
+        """Returns (start_time, end_time, per-file results, load report)"""
+        runner = self.runner
+        runner.keep_output_logs = False
+        start_time = datetime.now()
+        runner.prepare()
+        files = [(fpath, fname) for fpath, fname in runner._files if self.weights.get(fname, 1.0) > 0]
+        unknown = sorted(set(self.weights) - {fname for _, fname in runner._files})
+        if unknown:
+            runner._print_log(f"[LOAD] Weights for unknown files ignored: {', '.join(unknown)}", is_summary=True)
+
+        per_file = {fname: {"histogram": LatencyHistogram(), "errors": 0, "statements": 0, "error": None}
+                    for _, fname in files}
+        overall = LatencyHistogram()
+        intervals = []
+        window = {"histogram": LatencyHistogram(), "files": 0, "statements": 0, "errors": 0}
+        started = time.monotonic()
+        next_snapshot = started + self.interval
+        submitted = 0
+
+        def budget_left():
+            if self.iterations is not None:
+                return submitted < self.iterations
+            return time.monotonic() - started < self.duration
+
+        def snapshot(now):
+            elapsed = now - started
+            length = elapsed - (intervals[-1]["t"] if intervals else 0.0)
+            entry = {
+                "t": round(elapsed, 3),
+                "files": window["files"],
+                "statements": window["statements"],
+                "errors": window["errors"],
+                "files_per_sec": round(window["files"] / length, 3) if length > 0 else 0.0,
+                "statements_per_sec": round(window["statements"] / length, 3) if length > 0 else 0.0,
+            }
+            entry.update({k: v for k, v in window["histogram"].summary().items() if k != "count"})
+            intervals.append(entry)
+            runner._print_log(
+                f"[LOAD] t={entry['t']:.0f}s: {entry['files_per_sec']:.1f} files/s, "
+                f"{entry['statements_per_sec']:.1f} statements/s, p95 {entry['p95']:.3f}s, errors {entry['errors']}",
+                is_summary=True)
+            window.update(histogram=LatencyHistogram(), files=0, statements=0, errors=0)
+
+        controller = runner.controller
+        runner._print_log(
+            f"\n=== Load Mode: {len(files)} files, concurrency "
+            + (f"auto from {controller.limit} up to {controller.maximum}" if controller else f"{runner.concurrency}") + ", "
+            + (f"{self.iterations} executions" if self.iterations is not None else f"{self.duration:.0f}s")
+            + " ===", is_summary=True)
+        running = {}
+        if controller:
+            controller.begin()
+        try:
+            if files:
+                weights = [self.weights.get(fname, 1.0) for _, fname in files]
+                with ThreadPoolExecutor(max_workers=runner.concurrency, thread_name_prefix="worker") as executor:
+                    try:
+                        while True:
+                            limit = controller.limit if controller else runner.concurrency
+                            while len(running) < limit and budget_left():
+                                fpath, fname = self.random.choices(files, weights)[0]
+                                running[self._submit(executor, fpath, fname)] = fname
+                                submitted += 1
+                            if not running:
+                                break
+                            timeout = max(0.0, next_snapshot - time.monotonic())
+                            if controller:
+                                controller.note_demand(len(running), budget_left())
+                                timeout = min(timeout, controller.interval)
+                            if self.iterations is None and budget_left():
+                                # Wake up at the deadline to stop submitting
+                                timeout = min(timeout, max(0.0, started + self.duration - time.monotonic()))
+                            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                fname = running.pop(future)
+                                try:
+                                    result = future.result()
+                                except Exception as e:
+                                    result = {"status": "FAILED", "error": f"Runner error: {e}", "duration": 0.0}
+                                stats = per_file[fname]
+                                statements = sum(1 for st in result.get("statements") or [] if st.get("duration") is not None)
+                                stats["histogram"].record(result["duration"])
+                                stats["statements"] += statements
+                                overall.record(result["duration"])
+                                if controller:
+                                    controller.observe(fname, result["duration"])
+                                window["histogram"].record(result["duration"])
+                                window["files"] += 1
+                                window["statements"] += statements
+                                if result["status"] != "SUCCESS":
+                                    stats["errors"] += 1
+                                    stats["error"] = stats["error"] or result.get("error")
+                                    window["errors"] += 1
+                                if runner.result_stream is not None:
+                                    # Executions are only aggregated in memory; the stream keeps each one
+                                    runner.result_stream.write({
+                                        "file": fname, "type": runner.test_type, "status": result["status"],
+                                        "error": result.get("error"), "duration": result["duration"],
+                                        "statement_count": statements, "end_time": datetime.now().isoformat(timespec="milliseconds")})
+                            if controller and budget_left():
+                                controller.tick()
+                            now = time.monotonic()
+                            while now >= next_snapshot:
+                                snapshot(next_snapshot)
+                                next_snapshot += self.interval
+                    except BaseException:
+                        for future in running:
+                            future.cancel()
+                        raise
+                if window["files"] or not intervals:
+                    snapshot(time.monotonic())
+        finally:
+            runner.finish()
+
+        end_time = datetime.now()
+        elapsed = max(time.monotonic() - started, 1e-9)
+        results = []
+        report_files = {}
+        for fname, stats in per_file.items():
+            histogram = stats["histogram"]
+            if not histogram.count:
+                continue
+            latency = histogram.summary()
+            report_files[fname] = dict(latency, errors=stats["errors"], statements=stats["statements"],
+                                       files_per_sec=round(histogram.count / elapsed, 3))
+            results.append({
+                "file": fname,
+                "type": runner.test_type,
+                "status": "SUCCESS" if not stats["errors"] else "FAILED",
+                "error": f"{stats['errors']} of {histogram.count} executions failed, first: {stats['error']}" if stats["errors"] else None,
+                "duration": latency["mean"],
+                "load": report_files[fname],
+            })
+
+        total_statements = sum(stats["statements"] for stats in per_file.values())
+        load_report = {
+            "concurrency": controller.report()["peak"] if controller else runner.concurrency,
+            "engine": runner.engine,
+            "duration": round(elapsed, 3),
+            "executions": overall.count,
+            "errors": sum(stats["errors"] for stats in per_file.values()),
+            "statements": total_statements,
+            "files_per_sec": round(overall.count / elapsed, 3),
+            "statements_per_sec": round(total_statements / elapsed, 3),
+            "latency": overall.summary(),
+            "weights": {fname: self.weights.get(fname, 1.0) for _, fname in files},
+            "files": report_files,
+            "intervals": intervals,
+        }
+        runner._print_log(
+            f"[LOAD] {overall.count} executions in {elapsed:.1f}s: {load_report['files_per_sec']:.2f} files/s, "
+            f"{load_report['statements_per_sec']:.2f} statements/s, p50 {load_report['latency']['p50']:.3f}s, "
+            f"p99 {load_report['latency']['p99']:.3f}s, errors {load_report['errors']}", is_summary=True)
+        return start_time, end_time, results, load_report
+
+
+def _combine_stats_summaries(summaries):
+    """One '--server-stats' summary from the SQL runners of several targets"""
+    if len(summaries) == 1:
+        return summaries[0]
+    combined = {
+        "view": ", ".join(sorted({s["view"] for s in summaries})),
+        "totals": {k: sum(s["totals"][k] for s in summaries) for k in SERVER_STAT_COUNTERS},
+    }
+    for key in ("measured", "shared", "errors", "settle_seconds"):
+        combined[key] = sum(s[key] for s in summaries)
+    for key, counter in (("top_temp_bytes", "temp_bytes"), ("top_blks_read", "blks_read"), ("top_tup_written", "tup_written")):
+        combined[key] = sorted((t for s in summaries for t in s[key]), key=lambda t: -t[counter])[:SERVER_STATS_TOP]
+    return combined
+
+
+def merge_main(argv):
+    """'test_runner.py merge': combine JSON reports (e.g. from several machines) into one JSON/HTML report"""
+    parser = argparse.ArgumentParser(prog="test_runner.py merge",
+                                     description="Merge JSON reports of several runs into one report with a per-target breakdown.")
+    parser.add_argument("reports", nargs="+",
+                        help="JSON reports to merge, or *_results.jsonl streams (e.g. of a run that did not finish).")
+    parser.add_argument("--report-prefix", default="merged", help="Prefix for the merged report files (default: 'merged').")
+    args = parser.parse_args(argv)
+
+    results = []
+    starts, ends = [], []
+    schedules = {}
+    plan_changes = 0
+    for path in args.reports:
+        try:
+            if path.endswith(".jsonl"):
+                header, stream_results, trailer = _read_result_stream(path)
+                if trailer is None:
+                    print(f"[WARNING] {path}: The run did not finish, merging the {len(stream_results)} results it streamed")
+                elif trailer["results"] != len(stream_results):
+                    print(f"[WARNING] {path}: {len(stream_results)} of {trailer['results']} results could be read")
+                finished = [r["end_time"] for r in stream_results if r.get("end_time")]
+                report = {"start_time": header.get("start_time") or min(r["start_time"] for r in stream_results if r.get("start_time")),
+                          "end_time": max(finished) if finished else header["start_time"],
+                          "target": header.get("target"), "results": stream_results}
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    report = json.load(f)
+            start, end = datetime.fromisoformat(report["start_time"]), datetime.fromisoformat(report["end_time"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[FATAL ERROR] Cannot read report {path}: {e}", file=sys.stderr)
+            return 1
+        # Results of single-target runs carry no target of their own; older reports lack it altogether
+        fallback = report.get("target") or os.path.splitext(os.path.basename(path))[0]
+        for r in report.get("results", []):
+            r.setdefault("target", fallback)
+            results.append(r)
+        for key, stats in (report.get("schedules") or {}).items():
+            schedules[key if " @ " in key else f"{key} @ {fallback}"] = stats
+        plan_changes += report.get("plan_changes") or 0
+        starts.append(start)
+        ends.append(end)
+        print(f"[INFO] {path}: {len(report.get('results', []))} results")
+
+    if not os.path.exists(REPORT_DIR):
+        os.makedirs(REPORT_DIR)
+    base = os.path.join(REPORT_DIR, f"{args.report_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    generator = BaseTestRunner(f"{base}.json", f"{base}.html")
+    generator.results = results
+    extra = {"merged_from": args.reports, "targets": _target_breakdown(results), "plan_changes": plan_changes}
+    if schedules:
+        extra["schedules"] = schedules
+    generator._generate_reports(min(starts), max(ends), extra)
+    print(f"[INFO] Merged {len(results)} results from {len(args.reports)} reports into {base}.json and {base}.html")
+    return 0
+
+
+# --- Self-Benchmark ---
+# 'test_runner.py bench' runs generated suites against stand-ins for psql and bash that answer
+# with canned output after a fixed latency. Whatever the runner needs beyond that latency is its
+# own overhead: process spawn, environment and log handling, result collection and reporting.
+
+_BENCH_PSQL = r"""#!/bin/sh
+# psql stand-in written by 'test_runner.py bench'
+file=
+query=
+while [ $# -gt 0 ]; do
+    case "$1" in
+        -f) file="$2"; shift ;;
+        -c) query="$2"; shift ;;
+    esac
+    shift
+done
+if [ -z "$file" ]; then
+    # Housekeeping statement ('psql -tA -c ...')
+    case "$query" in
+        *"version()"*) echo "PostgreSQL 16.0 (test_runner.py bench stand-in)" ;;
+    esac
+    exit 0
+fi
+[ "$BENCH_LATENCY" = "0" ] || sleep "$BENCH_LATENCY"
+cat "$BENCH_DIR/psql.out"
+read -r marker < "$file"
+case "$marker" in
+    *"bench: fail"*)
+        echo "psql:$file:2: ERROR:  failure requested by the benchmark" >&2
+        exit "$BENCH_EXIT_CODE" ;;
+esac
+exit 0
+"""
+
+_BENCH_BASH = r"""#!/bin/sh
+# bash stand-in written by 'test_runner.py bench'
+[ "$BENCH_LATENCY" = "0" ] || sleep "$BENCH_LATENCY"
+cat "$BENCH_DIR/bash.out"
+{ read -r shebang; read -r marker; } < "$1"
+case "$marker" in
+    *"bench: fail"*)
+        echo "failure requested by the benchmark" >&2
+        exit "$BENCH_EXIT_CODE" ;;
+esac
+exit 0
+"""
+
+
+def _bench_int_list(text):
+    """argparse type for comma separated positive integers"""
+    try:
+        values = [int(v) for v in text.split(",") if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma separated integers, got '{text}'")
+    if not values or min(values) < 1:
+        raise argparse.ArgumentTypeError(f"expected positive integers, got '{text}'")
+    return values
+
+
+def _bench_prepare(bench_dir, statements, rows):
+    """Writes the psql/bash stand-ins and their canned output; returns the directory to put first on PATH"""
+    bin_dir = os.path.join(bench_dir, "bin")
+    os.makedirs(bin_dir)
+    for name, script in (("psql", _BENCH_PSQL), ("bash", _BENCH_BASH)):
+        path = os.path.join(bin_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(script)
+        os.chmod(path, 0o755)
+
+    # What 'psql -a' with '\timing on' prints for the generated files
+    lines = ["Timing is on."]
+    for i in range(1, statements + 1):
+        lines += [f"SELECT {i};", " ?column? ", "----------"]
+        lines += [f" {i}"] * rows
+        lines += [f"({rows} {'row' if rows == 1 else 'rows'})", "", "Time: 0.100 ms"]
+    with open(os.path.join(bench_dir, "psql.out"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    with open(os.path.join(bench_dir, "bash.out"), "w", encoding="utf-8") as f:
+        f.write("".join(f"bench output line {i}\n" for i in range(1, max(rows, 1) * statements + 1)))
+    return bin_dir
+
+
+def _bench_suite(bench_dir, size, statements, shell_ratio, fail_every):
+    """Generates a suite of 'size' files (a share of them Shell tests); every fail_every-th file fails"""
+    suite = {"size": size, "sql_dir": os.path.join(bench_dir, f"suite_{size}", "sql"),
+             "bash_dir": os.path.join(bench_dir, f"suite_{size}", "bash"), "shell": int(round(size * shell_ratio))}
+    os.makedirs(suite["sql_dir"])
+    os.makedirs(suite["bash_dir"])
+    body = "".join(f"SELECT {i};\n" for i in range(1, statements + 1))
+    for n in range(1, size + 1):
+        marker = "bench: fail" if fail_every and n % fail_every == 0 else "bench"
+        if n <= suite["shell"]:
+            path = os.path.join(suite["bash_dir"], f"bench_{n:05d}.sh")
+            content = f"#!/bin/bash\n# {marker}\necho bench\n"
+        else:
+            path = os.path.join(suite["sql_dir"], f"bench_{n:05d}.sql")
+            content = f"-- {marker}\n{body}"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        if n <= suite["shell"]:
+            os.chmod(path, 0o755)  # Shell tests must be executable
+    return suite
+
+
+def _bench_run(suite, work_dir, env, concurrency, engine, latency, timeout):
+    """One runner process over one suite; returns the measurements of that point"""
+    os.makedirs(work_dir)
+    command = [sys.executable, os.path.abspath(__file__),
+               "--host", "bench", "--port", "5432", "--user", "bench", "--password", "bench", "--dbname", "bench",
+               "--sql-dir", suite["sql_dir"], "--bash-dir", suite["bash_dir"],
+               "--concurrency", str(concurrency), "--shell-concurrency", str(concurrency),
+               "--engine", engine, "--report-prefix", "bench"]
+    if not suite["shell"]:
+        command += ["--only", "sql"]
+
+    point = {"files": suite["size"], "concurrency": concurrency, "engine": engine}
+    with open(os.path.join(work_dir, "console.txt"), "w", encoding="utf-8") as console:
+        launched = time.time()
+        started = time.monotonic()
+        process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=console, stderr=subprocess.STDOUT)
+        # wait4 instead of wait: the resource usage of exactly this process (and the stand-ins it waited for)
+        killer = threading.Timer(timeout, process.kill)
+        killer.start()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            killer.cancel()
+        process.returncode = os.waitstatus_to_exitcode(status)
+    point["wall_seconds"] = round(time.monotonic() - started, 3)
+    point["exit_code"] = process.returncode
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    point["peak_rss_mb"] = round(usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+    report_dir = os.path.join(work_dir, REPORT_DIR)
+    names = os.listdir(report_dir) if os.path.isdir(report_dir) else []
+    report_name = next((n for n in names if re.fullmatch(r"bench_\d{8}_\d{6}\.json", n)), None)
+    if report_name is None:
+        point["error"] = f"no report written, see {os.path.join(work_dir, 'console.txt')}"
+        return point
+    with open(os.path.join(report_dir, report_name), "r", encoding="utf-8") as f:
+        report = json.load(f)
+    with open(os.path.join(report_dir, report_name[:-len(".json")] + ".log"), "r", encoding="utf-8", errors="replace") as f:
+        m = re.search(r"Reports generated in ([0-9.]+)s", f.read())
+
+    results = report.get("results", [])
+    start, end = datetime.fromisoformat(report["start_time"]), datetime.fromisoformat(report["end_time"])
+    run_seconds = max((end - start).total_seconds(), 1e-6)
+    timeline = report.get("timeline") or {}
+    workers = len(timeline.get("workers") or []) or min(concurrency, len(results)) or 1
+    # Wall time the run would take if the runner cost nothing: every worker sleeping back to back
+    ideal = math.ceil(len(results) / workers) * latency if results else 0.0
+    point.update({
+        "tests": len(results),
+        "failed": sum(1 for r in results if r.get("status") == "FAILED"),
+        "skipped": sum(1 for r in results if r.get("status") == "SKIPPED"),
+        "workers": workers,
+        "startup_seconds": round(start.timestamp() - launched, 3),
+        "run_seconds": round(run_seconds, 3),
+        "report_seconds": float(m.group(1)) if m else None,
+        "tests_per_second": round(len(results) / run_seconds, 2),
+        "overhead_ms_per_test": round(max(run_seconds - ideal, 0.0) * workers / max(len(results), 1) * 1000, 3),
+        "utilization": timeline.get("utilization"),
+    })
+    if point["skipped"]:
+        # Nothing in a generated suite should be skipped: those tests never reached the stand-ins
+        first = next(r for r in results if r.get("status") == "SKIPPED")
+        point["error"] = f"{point['skipped']} test(s) skipped, e.g. {first['file']}: {first.get('error')}"
+    return point
+
+
+def _bench_line(point):
+    """Console line of one benchmark point"""
+    label = f"{point['files']} files @ {point['concurrency']} ({point['engine']})"
+    if "error" in point:
+        return f"[BENCH] {label}: {point['error']}"
+    report = f"{point['report_seconds']:.2f}s" if point["report_seconds"] is not None else "n/a"
+    return (f"[BENCH] {label}: {point['tests_per_second']:.1f} tests/s, {point['overhead_ms_per_test']:.2f} ms overhead/test, "
+            f"startup {point['startup_seconds']:.2f}s, report {report}, peak RSS {point['peak_rss_mb']:.0f} MB")
+
+
+def bench_main(argv):
+    """'test_runner.py bench': measure the runner's own overhead against stand-ins for psql and bash"""
+    parser = argparse.ArgumentParser(prog="test_runner.py bench",
+                                     description="Benchmark the runner itself: generated suites run against local psql/bash "
+                                                 "stand-ins, so all time beyond their latency is runner overhead.")
+    parser.add_argument("--concurrency", type=_bench_int_list, default=list(BENCH_CONCURRENCY),
+                        help=f"Comma separated concurrency levels (default: {','.join(map(str, BENCH_CONCURRENCY))}).")
+    parser.add_argument("--sizes", type=_bench_int_list, default=list(BENCH_SIZES),
+                        help=f"Comma separated suite sizes in files (default: {','.join(map(str, BENCH_SIZES))}).")
+    parser.add_argument("--engine", action="append", choices=["psql", "async"], default=None,
+                        help="Engine to benchmark (repeatable; default: psql). 'pool' needs a real server.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds each stand-in sleeps before answering (default: 0).")
+    parser.add_argument("--statements", type=int, default=5, help="Statements per generated SQL file (default: 5).")
+    parser.add_argument("--rows", type=int, default=1, help="Result rows the stand-in prints per statement (default: 1).")
+    parser.add_argument("--fail-every", type=int, default=0, metavar="N",
+                        help="Make every N-th file fail (default: 0, none fail).")
+    parser.add_argument("--exit-code", type=int, default=3, help="Exit code of failing stand-in runs (default: 3, like psql).")
+    parser.add_argument("--shell-ratio", type=float, default=0.0,
+                        help="Share of the generated files that are Shell tests (default: 0).")
+    parser.add_argument("--timeout", type=float, default=BENCH_TIMEOUT_SECONDS,
+                        help=f"Seconds before a single benchmark run is killed (default: {BENCH_TIMEOUT_SECONDS}).")
+    parser.add_argument("--output", default=None, help="JSON file for the results (default: test_report/bench_<timestamp>.json).")
+    parser.add_argument("--compare", default=None, metavar="JSON", help="Earlier benchmark JSON to compare tests/s with.")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated suites and run directories.")
+    args = parser.parse_args(argv)
+    if args.latency < 0 or args.statements < 1 or args.rows < 0 or args.fail_every < 0 or not 0 <= args.shell_ratio <= 1:
+        parser.error("--latency, --rows and --fail-every must not be negative, --statements must be positive "
+                     "and --shell-ratio must be between 0 and 1.")
+    if not hasattr(os, "wait4"):
+        parser.error("The benchmark needs os.wait4 (Linux or macOS).")
+    engines = args.engine or ["psql"]
+
+    baseline = {}
+    if args.compare:
+        try:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                earlier = json.load(f)
+            baseline = {(p["files"], p["concurrency"], p["engine"]): p for p in earlier["points"] if "error" not in p}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[FATAL ERROR] Cannot read benchmark {args.compare}: {e}", file=sys.stderr)
+            return 1
+
+    bench_dir = tempfile.mkdtemp(prefix="cbdb_bench_")
+    started = datetime.now()
+    points = []
+    try:
+        env = os.environ.copy()
+        env["PATH"] = _bench_prepare(bench_dir, args.statements, args.rows) + os.pathsep + env.get("PATH", "")
+        env["BENCH_DIR"] = bench_dir
+        env["BENCH_LATENCY"] = f"{args.latency:g}"
+        env["BENCH_EXIT_CODE"] = str(args.exit_code)
+        for size in sorted(set(args.sizes)):
+            suite = _bench_suite(bench_dir, size, args.statements, args.shell_ratio, args.fail_every)
+            # More workers than files measure nothing new
+            for concurrency in sorted(c for c in set(args.concurrency) if c <= size) or [size]:
+                for engine in engines:
+                    work_dir = os.path.join(bench_dir, f"run_{size}_{concurrency}_{engine}")
+                    point = _bench_run(suite, work_dir, env, concurrency, engine, args.latency, args.timeout)
+                    points.append(point)
+                    line = _bench_line(point)
+                    earlier = baseline.get((size, concurrency, engine))
+                    if earlier and "error" not in point and earlier.get("tests_per_second"):
+                        point["baseline_tests_per_second"] = earlier["tests_per_second"]
+                        line += f" [{point['tests_per_second'] / earlier['tests_per_second'] - 1:+.1%} tests/s]"
+                    print(line, flush=True)
+    finally:
+        if args.keep:
+            print(f"[INFO] Benchmark suites and runs kept in {bench_dir}")
+        else:
+            shutil.rmtree(bench_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(REPORT_DIR, f"bench_{started.strftime('%Y%m%d_%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "benchmark": "runner-overhead",
+            "runner_version": _runner_version(),
+            "started": started.isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {"latency": args.latency, "statements": args.statements, "rows": args.rows,
+                       "fail_every": args.fail_every, "exit_code": args.exit_code, "shell_ratio": args.shell_ratio},
+            "compared_with": args.compare,
+            "points": points,
+        }, f, indent=4)
+    print(f"[INFO] Benchmark results saved to {output}")
+    return 1 if any("error" in p for p in points) else 0
+
+
 def main():
     parser = argparse.ArgumentParser(description="Cloudberry Multi-Test Runner (SQL and Shell)")
     # DB arguments
-    parser.add_argument("--host", required=True)
+    parser.add_argument("--host", help="Coordinator host (or use --target / --targets-file).")
     parser.add_argument("--port", default=5432, type=int)
     parser.add_argument("--user", required=True)
     parser.add_argument("--password", required=True)
     parser.add_argument("--dbname", required=True)
+    parser.add_argument(
+        "--target", action="append", default=[], metavar="HOST[:PORT][/DBNAME]",
+        help="Run the suite on several clusters at once, sharded by predicted duration (repeatable; "
+             "--port and --dbname are the defaults, --host counts as one more target)."
+    )
+    parser.add_argument("--targets-file", help="File with one HOST[:PORT][/DBNAME] target per line ('#' starts a comment).")
     # Directory arguments
     parser.add_argument("--sql-dir", default="sql_tests", help="Directory containing SQL test scripts.")
     parser.add_argument("--bash-dir", default="bash_tests", help="Directory containing Shell test scripts.")
@@ -413,13 +3880,179 @@ def main():
     )
     # --- NEW CONCURRENCY PARAMETER ---
     parser.add_argument(
-        "--concurrency", type=int, default=os.cpu_count() or 4, 
-        help="Number of parallel SQL test files to execute (default: CPU count or 4)."
+        "--concurrency", type=_concurrency_arg, default=DEFAULT_CONCURRENCY, 
+        help=f"Number of parallel SQL test files (database sessions) to execute (default: {DEFAULT_CONCURRENCY}). "
+             "Size it for the cluster, not the client machine. 'auto' adapts it during the run (AIMD) from "
+             "throughput, latency inflation, lock waits and connection headroom."
+    )
+    parser.add_argument(
+        "--server-stats", action="store_true",
+        help="(SQL ONLY) Snapshot pg_stat_database (per segment from gp_stat_database where available) before and after "
+             "every file and report its block I/O, temp spill, tuple and transaction deltas. With --isolation database "
+             f"the final read waits until the counters settle: at least {SERVER_STATS_SETTLE}s per file."
+    )
+    answers_group = parser.add_mutually_exclusive_group()
+    answers_group.add_argument(
+        "--record-answers", action="store_true",
+        help=f"(SQL ONLY) Store the normalized per-statement results of every passing file in "
+             f"<sql-dir>/{ANSWER_DIR}/{ANSWER_INDEX_FILE}."
+    )
+    answers_group.add_argument(
+        "--verify-answers", action="store_true",
+        help="(SQL ONLY) Compare every file's normalized per-statement results with the recorded answers; "
+             "a mismatch fails the file and writes a diff next to its log. Files with '@verify: off' are not checked."
+    )
+    parser.add_argument(
+        "--max-concurrency", type=int, default=AUTO_CONCURRENCY_MAX,
+        help=f"Upper bound for '--concurrency auto' (default: {AUTO_CONCURRENCY_MAX}); also capped by the server's free connections."
     )
     # ---------------------------------
+    parser.add_argument(
+        "--engine", choices=["psql", "pool", "async"], default="psql",
+        help="SQL execution engine: 'psql' spawns 'psql -f' per file, 'pool' reuses one libpq connection per worker (requires psycopg2), "
+             "'async' drives the 'psql -f' processes from one asyncio event loop instead of a thread each (suits hundreds of sessions)."
+    )
+
+    parser.add_argument(
+        "--shell-concurrency", type=int, default=1,
+        help="Number of Shell scripts to execute in parallel, alongside the SQL tests (default: 1)."
+    )
+    parser.add_argument(
+        "--schedule", choices=["lpt", "name"], default="lpt",
+        help="SQL dispatch order: 'lpt' starts the longest files first using durations from earlier reports, 'name' uses alphabetical order."
+    )
+
+    parser.add_argument(
+        "--isolation", choices=["none", "schema", "database"], default="none",
+        help="Run every SQL file in its own schema (via search_path) or its own database cloned from --isolation-template, dropped afterwards."
+    )
+    parser.add_argument(
+        "--isolation-template", default="template1",
+        help="Template database used by '--isolation database' (default: template1)."
+    )
+    parser.add_argument(
+        "--drop-stale-fixtures", action="store_true",
+        help="After rebuilding a fixture template, drop the templates of other definitions of the same fixture set. "
+             "Only safe when no other run on the cluster still uses them."
+    )
+
+    parser.add_argument(
+        "--resource-limit", action="append", default=[], metavar="NAME=N",
+        help="Run at most N tests tagged '@resource: NAME' at once (repeatable; overrides @max-parallel)."
+    )
+
+    parser.add_argument(
+        "--compare-baseline", action="store_true",
+        help="Compare durations with the previous runs in test_report/history.jsonl and mark significantly slower tests as REGRESSED (exit code 3)."
+    )
+    parser.add_argument(
+        "--baseline-runs", type=int, default=BASELINE_RUNS,
+        help=f"Number of earlier successful runs of each test used as its baseline (default: {BASELINE_RUNS})."
+    )
+    parser.add_argument(
+        "--regression-sigma", type=float, default=REGRESSION_SIGMA,
+        help=f"A regression must exceed the baseline median by this many standard deviations (default: {REGRESSION_SIGMA})."
+    )
+    parser.add_argument(
+        "--regression-min-slowdown", type=float, default=REGRESSION_MIN_SLOWDOWN,
+        help=f"... and be at least this fraction slower than the median (default: {REGRESSION_MIN_SLOWDOWN})."
+    )
+
+    parser.add_argument(
+        "--changed-only", action="store_true",
+        help="Skip tests whose file, dependencies, configuration, server version and runner are unchanged since they last passed; "
+             "they are reported as CACHED. Omit the flag to force a full run."
+    )
+    parser.add_argument(
+        "--clear-cache", action="store_true",
+        help="Forget all cached results (test_report/result_cache.json) before running."
+    )
+    parser.add_argument(
+        "--load", action="store_true",
+        help="Load/soak mode: run a weighted random mix of the SQL files at --concurrency for --load-duration or --load-iterations "
+             "and report throughput and latency percentiles (Shell tests are not run)."
+    )
+    parser.add_argument(
+        "--load-duration", type=float, default=None,
+        help=f"Seconds to keep submitting files in --load mode (default: {LOAD_DEFAULT_DURATION:.0f} unless --load-iterations is given)."
+    )
+    parser.add_argument(
+        "--load-iterations", type=int, default=None,
+        help="Total number of file executions in --load mode."
+    )
+    parser.add_argument(
+        "--load-weight", action="append", default=[], metavar="FILE=W",
+        help="Relative weight of a SQL file in the --load mix (repeatable; default 1, 0 excludes the file)."
+    )
+    parser.add_argument(
+        "--load-interval", type=float, default=LOAD_INTERVAL_SECONDS,
+        help=f"Seconds per throughput/latency snapshot in --load mode (default: {LOAD_INTERVAL_SECONDS:.0f})."
+    )
 
+    if len(sys.argv) > 1 and sys.argv[1] == "merge":
+        return merge_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        return bench_main(sys.argv[2:])
     args = parser.parse_args()
 
+    target_specs = ([f"{args.host}:{args.port}"] if args.host else []) + list(args.target)
+    if args.targets_file:
+        try:
+            target_specs += _read_targets_file(args.targets_file)
+        except OSError as e:
+            parser.error(f"Cannot read --targets-file: {e}")
+    targets = []
+    for spec in target_specs:
+        parsed = _parse_target(spec, args.port, args.dbname)
+        if parsed is None:
+            parser.error(f"Targets are HOST[:PORT][/DBNAME], got '{spec}'.")
+        host, port, dbname = parsed
+        target = {"host": host, "port": port, "user": args.user, "password": args.password, "dbname": dbname}
+        if target not in targets:
+            targets.append(target)
+    if not targets:
+        parser.error("Give the cluster with --host, --target or --targets-file.")
+    if args.load and len(targets) > 1:
+        parser.error("--load runs against a single target.")
+
+    if args.baseline_runs < 1:
+        parser.error("--baseline-runs must be at least 1.")
+
+    if args.concurrency != "auto" and args.concurrency < 1 or args.shell_concurrency < 1 or args.max_concurrency < 1:
+        parser.error("--concurrency, --max-concurrency and --shell-concurrency must be at least 1.")
+
+    resource_limits = {}
+    for spec in args.resource_limit:
+        name, _, value = spec.partition("=")
+        if not name or not value.isdigit() or int(value) < 1:
+            parser.error(f"--resource-limit expects NAME=N with N >= 1, got '{spec}'.")
+        resource_limits[name] = int(value)
+
+    load_weights = {}
+    for spec in args.load_weight:
+        name, _, value = spec.rpartition("=")
+        try:
+            load_weights[name] = float(value)
+        except ValueError:
+            name = ""
+        if not name or load_weights[name] < 0:
+            parser.error(f"--load-weight expects FILE=W with W >= 0, got '{spec}'.")
+    if args.load:
+        if args.changed_only or args.server_stats or args.record_answers or args.verify_answers:
+            parser.error("--changed-only, --server-stats and answer files cannot be combined with --load.")
+        if args.only == "shell":
+            parser.error("--load runs SQL files; it cannot be combined with '--only shell'.")
+        if args.load_duration is not None and args.load_iterations is not None:
+            parser.error("Use either --load-duration or --load-iterations, not both.")
+        if (args.load_duration is not None and args.load_duration <= 0) or \
+                (args.load_iterations is not None and args.load_iterations < 1) or args.load_interval <= 0:
+            parser.error("--load-duration, --load-iterations and --load-interval must be positive.")
+        if args.load_duration is None and args.load_iterations is None:
+            args.load_duration = LOAD_DEFAULT_DURATION
+
+    if args.engine == "pool" and psycopg2 is None:
+        parser.error("--engine pool requires the psycopg2 package (python3 -m pip install psycopg2-binary).")
+
     # --- 1. File Naming and Directory Setup ---
     suite_start_time = datetime.now() 
     timestamp = suite_start_time.strftime("%Y%m%d_%H%M%S")
@@ -436,10 +4069,14 @@ def main():
     log_file_path = os.path.join(REPORT_DIR, f"{file_name_base}.log")
     json_report_path = os.path.join(REPORT_DIR, f"{file_name_base}.json")
     html_report_path = os.path.join(REPORT_DIR, f"{file_name_base}.html")
+    log_index_path = os.path.join(REPORT_DIR, f"{file_name_base}_logs", "index.json")
 
     # --- 2. Initialize Logging ---
+    # All log writes go through one background LogWriter; per-test output lands in <base>_logs/
     try:
-        output_file_handle = open(log_file_path, 'w', encoding='utf-8')
+        open(log_file_path, 'w', encoding='utf-8').close()
+        log_writer = LogWriter()
+        output_file_handle = log_writer.open_handle(log_file_path)
         _log(f"--- Test Suite Started at {suite_start_time} ---", output_file_handle)
         print(f"[INFO] Starting test execution. Detailed log: {log_file_path}") 
     except Exception as e:
@@ -447,38 +4084,167 @@ def main():
         return
 
     # --- 3. Prepare Configuration ---
-    db_config = {
-        "host": args.host, "port": args.port, "user": args.user,
-        "password": args.password, "dbname": args.dbname,
-    }
+    # One db_config per target; a single target behaves exactly like --host/--port
+    multi_target = len(targets) > 1
     
     all_results = []
+    report_extra = {}
     suite_end_time = suite_start_time 
+    history_store = HistoryStore(os.path.join(REPORT_DIR, HISTORY_FILE))
+    history = DurationHistory().load()
+    regressions = 0
+    result_cache = None
+    result_cache_path = os.path.join(REPORT_DIR, RESULT_CACHE_FILE)
 
     # --- 4. Selective Execution Logic ---
 
-    # Run SQL Tests
-    if args.only is None or args.only == "sql":
-        sql_runner = SQLTestRunner(
-            db_config, args.sql_dir, args.file_sql, 
-            json_report_path, html_report_path, output_file_handle, 
-            args.concurrency # <--- NEW: Pass concurrency
-        )
-        _, suite_end_time, sql_results = sql_runner.run()
-        all_results.extend(sql_results)
-    else:
-        _log("\n[INFO] Skipping SQL Test Runner due to '--only' selection.", output_file_handle)
+    runners = []
+    target_runners = []  # Runners of each target, in target order
 
-    # Run Shell Tests
-    if args.only is None or args.only == "shell":
-        shell_runner = ShellTestRunner(
-            args.bash_dir, args.file_bash, 
-            json_report_path, html_report_path, output_file_handle
-        )
-        _, suite_end_time, shell_results = shell_runner.run()
-        all_results.extend(shell_results)
-    else:
-        _log("\n[INFO] Skipping Shell Test Runner due to '--only' selection.", output_file_handle)
+    for db_config in targets:
+        runners_of_target = []
+        # Run SQL Tests
+        if args.only is None or args.only == "sql":
+            controller = None
+            concurrency = args.concurrency
+            if concurrency == "auto":
+                concurrency = _auto_concurrency_limit(db_config, args.max_concurrency, output_file_handle)
+                controller = ConcurrencyController(
+                    db_config, start=min(AUTO_CONCURRENCY_START, concurrency), maximum=concurrency,
+                    log=lambda message, **kwargs: _log(message, output_file_handle, **kwargs),
+                    name=_target_label(db_config) if multi_target else None)
+            sql_runner = SQLTestRunner(
+                db_config, args.sql_dir, args.file_sql, 
+                json_report_path, html_report_path, output_file_handle, 
+                concurrency, # <--- NEW: Pass concurrency
+                engine=args.engine, schedule=args.schedule, history=history,
+                isolation=args.isolation, isolation_template=args.isolation_template,
+                resource_limits=resource_limits
+            )
+            sql_runner.controller = controller
+            sql_runner.server_stats = args.server_stats
+            sql_runner.drop_stale_fixtures = args.drop_stale_fixtures
+            sql_runner.answer_mode = "record" if args.record_answers else "verify" if args.verify_answers else None
+            runners_of_target.append(sql_runner)
+        elif not target_runners:
+            _log("\n[INFO] Skipping SQL Test Runner due to '--only' selection.", output_file_handle)
+
+        # Run Shell Tests
+        if args.load:
+            _log("\n[INFO] Load mode: Shell tests are not part of the workload.", output_file_handle)
+        elif args.only is None or args.only == "shell":
+            shell_runner = ShellTestRunner(
+                args.bash_dir, args.file_bash, 
+                json_report_path, html_report_path, output_file_handle,
+                concurrency=args.shell_concurrency, schedule=args.schedule, history=history,
+                env=_pg_env(db_config)
+            )
+            runners_of_target.append(shell_runner)
+        elif not target_runners:
+            _log("\n[INFO] Skipping Shell Test Runner due to '--only' selection.", output_file_handle)
+
+        for runner in runners_of_target:
+            runner.target = _target_label(db_config) if multi_target else None
+        target_runners.append(runners_of_target)
+        runners.extend(runners_of_target)
+
+    if multi_target and runners:
+        # Every target has the same runners; the first target's list the files for all of them
+        files, predicted = [], {}
+        for runner in target_runners[0]:
+            default = history.default_duration(runner.test_type)
+            for fpath, fname in runner._get_files():
+                files.append((fpath, fname))
+                estimate = history.predict(fname, runner.test_type)
+                predicted[fname] = default if estimate is None else estimate
+        shards, work = _shard_files(files, predicted, len(targets))
+        for db_config, runners_of_target, names, seconds in zip(targets, target_runners, shards, work):
+            for runner in runners_of_target:
+                runner.shard = names
+            _log(f"[SHARD] {_target_label(db_config)}: {len(names)} files, {seconds:.1f}s predicted", output_file_handle, is_summary=True)
+
+    # Every result (every execution with --load) is appended here as soon as it finishes
+    result_stream = None
+    if runners:
+        stream_path = os.path.join(REPORT_DIR, f"{file_name_base}_results.jsonl")
+        header = {"run_id": file_name_base, "start_time": str(suite_start_time), "load": bool(args.load)}
+        if multi_target:
+            header["targets"] = [_target_label(db_config) for db_config in targets]
+        else:
+            header["target"] = _target_label(targets[0])
+        try:
+            result_stream = ResultStream(stream_path, header)
+            for runner in runners:
+                runner.result_stream = result_stream
+            _log(f"[INFO] Streaming results to {stream_path}", output_file_handle)
+        except OSError as e:
+            _log(f"[WARNING] Could not open result stream {stream_path}: {e}", output_file_handle, is_error=True)
+
+    if args.load:
+        load_runner = LoadRunner(runners[0], duration=args.load_duration, iterations=args.load_iterations,
+                                 weights=load_weights, interval=args.load_interval)
+        _, suite_end_time, all_results, report_extra["load"] = load_runner.run()
+        if runners[0].controller:
+            report_extra["concurrency_control"] = runners[0].controller.report()
+
+    # SQL and Shell tests share one work queue and worker pool
+    elif runners:
+        # Cache keys include the server version; without it cached results are never used
+        if args.clear_cache:
+            ResultCache.clear(result_cache_path)
+            _log(f"[CACHE] Cleared {result_cache_path}", output_file_handle, is_summary=True)
+        server_versions = []
+        for db_config in targets:
+            return_code, server_version, error = _psql_query(db_config, "SELECT version()")
+            if return_code != 0:
+                server_versions = None
+                _log(f"[CACHE] Could not read the server version of {_target_label(db_config)}, cached results are not used: {error}",
+                     output_file_handle, is_error=True, is_summary=args.changed_only)
+                break
+            server_versions.append(f"{_target_label(db_config)}: {server_version}" if multi_target else server_version)
+        result_cache = ResultCache(result_cache_path, "\n".join(server_versions) if server_versions else None)
+        for runner in runners:
+            runner.result_cache = result_cache
+            runner.changed_only = args.changed_only
+
+        unified_runner = UnifiedTestRunner(runners, json_report_path, html_report_path, output_file_handle)
+        _, suite_end_time, all_results = unified_runner.run()
+        stats_summaries = []
+        for runner in runners:
+            if runner.schedule_stats:
+                report_extra.setdefault("schedule", runner.schedule_stats)
+                report_extra.setdefault("schedules", {})[runner.label] = runner.schedule_stats
+            if runner.controller:
+                report_extra.setdefault("concurrency_control", runner.controller.report())
+            if getattr(runner, "server_stats", False):
+                stats_summaries.append(runner.stats_summary())
+            if getattr(runner, "answer_mode", None):
+                runner.save_answers()
+        if stats_summaries:
+            report_extra["server_stats"] = _combine_stats_summaries(stats_summaries)
+        if args.record_answers or args.verify_answers:
+            answered = [r for r in all_results if r.get("answers")]
+            report_extra["answers"] = {
+                "mode": "record" if args.record_answers else "verify",
+                "index": os.path.join(args.sql_dir, ANSWER_DIR, ANSWER_INDEX_FILE),
+                "statements": sum(r["answers"].get("recorded", r["answers"].get("verified", 0)) for r in answered),
+                "mismatched": [r["file"] for r in answered if r["answers"].get("mismatched")],
+                "unverified": [r["file"] for r in answered if r["answers"].get("error")],
+                "off": [r["file"] for r in answered if r["answers"].get("verify") == "off"],
+            }
+            answers = report_extra["answers"]
+            _log(f"[ANSWER] {answers['statements']} statement(s) {'recorded' if args.record_answers else 'verified'}, "
+                 f"{len(answers['mismatched'])} file(s) with wrong results, {len(answers['unverified'])} without usable answers, "
+                 f"{len(answers['off'])} with '@verify: off'", output_file_handle, is_summary=True)
+        if not multi_target:
+            report_extra["target"] = _target_label(targets[0])
+        else:
+            report_extra["targets"] = _target_breakdown(all_results)
+            for label, t in report_extra["targets"].items():
+                _log(f"[TARGET] {label}: {t['total']} tests, {t['success']} passed, {t['failed']} failed, "
+                     f"busy {t['busy_time']:.1f}s over {t['makespan'] or 0:.1f}s", output_file_handle, is_summary=True)
+    if result_stream is not None:
+        result_stream.close()
         
     # --- 5. Generate Unified Reports ---
     if not all_results:
@@ -489,7 +4255,84 @@ def main():
         # Use a BaseTestRunner instance to handle unified report generation
         report_generator = BaseTestRunner(json_report_path, html_report_path, output_file_handle)
         report_generator.results = all_results 
-        report_generator._generate_reports(suite_start_time, suite_end_time)
+
+        # Compare with earlier runs against the same target before this run joins the history.
+        # Latencies under --load are not comparable with single runs, so load runs stay out of it.
+        plan_changes = 0
+        # History, plans and baselines are kept per target: each result compares with runs on its own cluster
+        results_by_target = {}
+        for result in all_results:
+            results_by_target.setdefault(result.get("target") or _target_label(targets[0]), []).append(result)
+        earlier_runs = [] if args.load else history_store.runs()
+        baseline_runs_by_target = {}
+        for history_target, target_results in ({} if args.load else results_by_target).items():
+            target_runs = [run for run in earlier_runs if run.get("target") == history_target]
+            plan_history = PlanHistory(target_runs)
+            for result in target_results:
+                changed = plan_history.compare(result)
+                if changed:
+                    plan_changes += changed
+                    for stmt in result["statements"]:
+                        if stmt.get("plan_change"):
+                            change = stmt["plan_change"]
+                            _log(f"[PLAN] {result['file']} statement #{stmt['index']} (line {stmt['line']}) changed plan: "
+                                 f"lost {change['lost'] or '-'}, added {change['added'] or '-'}",
+                                 output_file_handle, is_summary=True)
+
+            if args.compare_baseline:
+                baseline_runs_by_target[history_target] = len(target_runs)
+                comparator = BaselineComparator(target_runs, max_samples=args.baseline_runs, sigma=args.regression_sigma,
+                                                min_slowdown=args.regression_min_slowdown)
+                _log(f"\n[BASELINE] Comparing with the last {args.baseline_runs} successful run(s) of each test "
+                     f"({len(target_runs)} earlier run(s) against {history_target})", output_file_handle, is_summary=True)
+                for result in target_results:
+                    if comparator.compare(result):
+                        regressions += 1
+                        _log(f"[REGRESSED] {result['file']}: {result['error']}", output_file_handle, is_error=True, is_summary=True)
+        if not args.load:
+            report_extra["plan_changes"] = plan_changes
+        if baseline_runs_by_target:
+            report_extra["baseline"] = {"runs": max(baseline_runs_by_target.values()), "samples": args.baseline_runs,
+                                        "target": ", ".join(baseline_runs_by_target), "regressions": regressions}
+            if multi_target:
+                report_extra["baseline"]["targets"] = baseline_runs_by_target
+        if not args.load:
+            report_extra["timeline"] = _utilization_timeline(all_results, suite_start_time, suite_end_time)
+            _log(f"[SCHED] Idle worker time: {report_extra['timeline']['idle']:.1f}s "
+                 f"({1 - report_extra['timeline']['utilization']:.1%} of {len(report_extra['timeline']['workers'])} workers "
+                 f"over {report_extra['timeline']['makespan']:.1f}s)", output_file_handle, is_summary=True)
+
+        report_started = time.monotonic()
+        report_generator._generate_reports(suite_start_time, suite_end_time, report_extra)
+
+        # Worker activity for chrome://tracing / ui.perfetto.dev
+        if not args.load:
+            trace_path = os.path.join(REPORT_DIR, f"{file_name_base}_trace.json")
+            controllers = {id(r.controller): (r.label if multi_target else "", r.controller.report())
+                           for r in runners if r.controller}
+            fixture_spans = [span for r in runners for span in getattr(r, "fixture_spans", [])]
+            try:
+                with open(trace_path, "w", encoding="utf-8") as f:
+                    json.dump(_chrome_trace(all_results, suite_start_time, fixture_spans, controllers.values()), f, ensure_ascii=False)
+                _log(f"[INFO] Trace saved to {trace_path} (open in ui.perfetto.dev or chrome://tracing)", output_file_handle)
+            except OSError as e:
+                _log(f"[WARNING] Could not write trace {trace_path}: {e}", output_file_handle, is_error=True)
+        _log(f"[INFO] Reports generated in {time.monotonic() - report_started:.3f}s", output_file_handle)
+
+        if not args.load:
+            try:
+                for history_target, target_results in results_by_target.items():
+                    history_store.append(HistoryStore.make_record(
+                        file_name_base, suite_start_time, suite_end_time, history_target, target_results))
+            except OSError as e:
+                _log(f"[WARNING] Could not append to run history {history_store.path}: {e}", output_file_handle, is_error=True)
+
+        if result_cache is not None:
+            result_cache.update(all_results, file_name_base)
+            try:
+                result_cache.save()
+            except OSError as e:
+                _log(f"[WARNING] Could not save result cache {result_cache.path}: {e}", output_file_handle, is_error=True)
         
         final_summary = report_generator.results
         total = len(final_summary)
@@ -497,14 +4340,22 @@ def main():
         failed = sum(1 for r in final_summary if r["status"] == "FAILED")
         
         print(f"\n=== Test Completed Summary ===")
-        print(f"Total: {total}, Success: {success}, Failed: {failed}")
+        print(f"Total: {total}, Success: {success}, Failed: {failed}"
+              + (f", Regressed: {regressions}" if args.compare_baseline else "")
+              + (f", Plan changes: {plan_changes}" if plan_changes else "")
+              + (f", Cached: {sum(1 for r in final_summary if r['status'] == 'CACHED')}" if args.changed_only else ""))
         print(f"HTML reports saved to {os.path.abspath(html_report_path)}")
         print(f"JSON reports saved to {os.path.abspath(json_report_path)}")
 
     _log("\n=== All Selected Tests Completed ===", output_file_handle)
 
     # --- 6. Final Cleanup ---
-    output_file_handle.close() 
+    log_writer.close()
+    if log_writer.index:
+        log_writer.write_index(log_index_path)
+
+    if regressions:
+        return EXIT_REGRESSED
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
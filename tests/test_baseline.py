@@ -0,0 +1,87 @@
+"""BaselineComparator regression verdicts against synthetic run history"""
+from test_runner import BaselineComparator, _statement_key
+
+STATEMENT = {"index": 1, "line": 3, "text": "SELECT count(*) FROM t;"}
+
+
+def _run(duration, status="SUCCESS", file="a.sql", statement=None):
+    result = {"type": "sql", "file": file, "status": status, "duration": duration}
+    if statement is not None:
+        result["statements"] = {_statement_key(STATEMENT): statement}
+    return {"results": [result]}
+
+
+def _result(duration, file="a.sql", statement=None):
+    result = {"type": "sql", "file": file, "status": "SUCCESS", "duration": duration}
+    if statement is not None:
+        result["statements"] = [dict(STATEMENT, duration=statement, error=None)]
+    return result
+
+
+def test_no_verdict_without_enough_samples():
+    comparator = BaselineComparator([_run(1.0), _run(1.0)], min_samples=3)
+    result = _result(10.0)
+    assert comparator.compare(result) is False
+    assert result["status"] == "SUCCESS" and "baseline" not in result
+
+
+def test_slow_run_regresses():
+    comparator = BaselineComparator([_run(d) for d in (1.0, 1.02, 0.98, 1.01, 0.99)])
+    result = _result(2.0)
+    assert comparator.compare(result) is True
+    assert result["status"] == "REGRESSED"
+    assert "baseline median 1.000s" in result["error"]
+    assert result["baseline"]["samples"] == 5 and result["baseline"]["ratio"] == 2.0
+
+
+def test_jitter_does_not_regress():
+    comparator = BaselineComparator([_run(d) for d in (1.0, 1.02, 0.98, 1.01, 0.99)])
+    result = _result(1.1)
+    assert comparator.compare(result) is False
+    assert result["status"] == "SUCCESS"
+    assert result["baseline"]["median"] == 1.0 and not result["baseline"]["regressed"]
+
+
+def test_small_absolute_delta_does_not_regress():
+    # Three times slower, but only 20ms: below REGRESSION_MIN_DELTA
+    comparator = BaselineComparator([_run(0.01) for _ in range(5)])
+    assert comparator.compare(_result(0.03)) is False
+    assert comparator.compare(_result(0.2)) is True
+
+
+def test_noisy_history_raises_the_threshold():
+    comparator = BaselineComparator([_run(d) for d in (1.0, 2.0, 1.0, 2.0, 1.0, 2.0)])
+    assert comparator.compare(_result(2.5)) is False
+
+
+def test_baseline_uses_last_successful_samples():
+    history = [_run(5.0) for _ in range(5)] + [_run(1.0) for _ in range(3)] + [_run(9.0, status="FAILED")]
+    comparator = BaselineComparator(history, max_samples=3)
+    result = _result(1.0)
+    assert comparator.compare(result) is False
+    # Old slow runs fell out of the window, the failed run never counts
+    assert result["baseline"]["median"] == 1.0 and result["baseline"]["samples"] == 3
+    assert comparator.compare(_result(2.0)) is True
+
+
+def test_only_successful_results_are_compared():
+    comparator = BaselineComparator([_run(1.0) for _ in range(5)])
+    result = dict(_result(10.0), status="FAILED")
+    assert comparator.compare(result) is False
+    assert result["status"] == "FAILED" and "baseline" not in result
+
+
+def test_files_are_compared_separately():
+    comparator = BaselineComparator([_run(1.0, file="a.sql") for _ in range(5)] + [_run(5.0, file="b.sql") for _ in range(5)])
+    assert comparator.compare(_result(4.0, file="b.sql")) is False
+    assert comparator.compare(_result(4.0, file="a.sql")) is True
+
+
+def test_slow_statement_regresses_the_file():
+    comparator = BaselineComparator([_run(2.0, statement=0.5) for _ in range(5)])
+    result = _result(2.05, statement=1.5)
+    assert comparator.compare(result) is True
+    stmt = result["statements"][0]
+    assert stmt["regressed"] and stmt["baseline_median"] == 0.5
+    assert "statement #1 (line 3)" in result["error"]
+    assert not result["baseline"]["regressed"]  # The file as a whole stayed within its threshold
@@ -0,0 +1,64 @@
+"""LatencyHistogram percentiles and merging"""
+import math
+import random
+
+from test_runner import LatencyHistogram
+
+
+def _exact(values, p):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * p / 100.0)) - 1]
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(99) == 0.0
+    assert histogram.summary() == {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for micros in range(1, 101):
+        histogram.record(micros / 1_000_000)
+    # Below 2**SUB_BUCKET_BITS microseconds every value has a bucket of its own
+    assert histogram.percentile(50) == 50 / 1_000_000
+    assert histogram.percentile(100) == 100 / 1_000_000
+
+
+def test_percentiles_within_bucket_precision():
+    rng = random.Random(42)
+    values = [rng.lognormvariate(-3, 1.5) for _ in range(20000)]
+    histogram = LatencyHistogram()
+    for v in values:
+        histogram.record(v)
+    for p in (1, 50, 90, 95, 99, 99.9):
+        exact = _exact(values, p)
+        # Upper bound of the bucket: never below the true value, at most 1/64 above it
+        assert exact - 1e-6 <= histogram.percentile(p) <= exact * (1 + 1 / 64) + 1e-6, p
+    assert histogram.percentile(100) == max(values)
+    summary = histogram.summary()
+    assert summary["count"] == len(values)
+    assert summary["mean"] == round(sum(values) / len(values), 6)
+    assert summary["max"] == round(max(values), 6)
+
+
+def test_percentile_never_exceeds_max():
+    histogram = LatencyHistogram()
+    for v in (0.1, 0.1, 1.0001):
+        histogram.record(v)
+    assert histogram.percentile(99) == 1.0001
+
+
+def test_merge_equals_recording_everything():
+    rng = random.Random(7)
+    values = [rng.uniform(0.001, 5.0) for _ in range(3000)]
+    combined, parts = LatencyHistogram(), [LatencyHistogram() for _ in range(3)]
+    for i, v in enumerate(values):
+        combined.record(v)
+        parts[i % 3].record(v)
+    merged = LatencyHistogram()
+    for part in parts:
+        merged.merge(part)
+    assert merged.counts == combined.counts
+    assert merged.count == combined.count and merged.max == combined.max
+    assert merged.summary() == combined.summary()
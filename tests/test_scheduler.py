@@ -0,0 +1,104 @@
+"""TaskScheduler on small task graphs (no server needed)"""
+import threading
+import time
+
+from test_runner import TaskScheduler
+
+
+class Recorder:
+    """Builds tasks that log when they start and end and track how many run at once"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.running = set()
+        self.overlaps = []  # Set of running task names, seen at every start
+
+    def task(self, name, depends=(), exclusive=False, resources=(), scope=None, status="SUCCESS", sleep=0.05):
+        def fn():
+            with self.lock:
+                self.events.append(("start", name))
+                self.running.add(name)
+                self.overlaps.append(set(self.running))
+            time.sleep(sleep)
+            with self.lock:
+                self.running.discard(name)
+                self.events.append(("end", name))
+            return {"file": name, "status": status, "error": None, "duration": sleep, "type": "sql"}
+
+        task = {"name": name, "type": "sql", "fn": fn, "depends": list(depends),
+                "exclusive": exclusive, "resources": list(resources)}
+        if scope is not None:
+            task["scope"] = scope
+        return task
+
+    def position(self, kind, name):
+        return self.events.index((kind, name))
+
+
+def _run(tasks, max_workers=4, resource_limits=None):
+    results, messages = {}, []
+    scheduler = TaskScheduler(max_workers, resource_limits, log=lambda message, **kwargs: messages.append(message))
+    scheduler.run(tasks, lambda result: results.__setitem__(result["file"], result))
+    return results, messages
+
+
+def test_dependencies_run_in_order():
+    rec = Recorder()
+    results, _ = _run([rec.task("c", depends=["b"]), rec.task("b", depends=["a"]), rec.task("a")])
+    assert {name: r["status"] for name, r in results.items()} == {"a": "SUCCESS", "b": "SUCCESS", "c": "SUCCESS"}
+    assert rec.position("end", "a") < rec.position("start", "b")
+    assert rec.position("end", "b") < rec.position("start", "c")
+    assert all(r["worker"].startswith("worker") and r["start_time"] <= r["end_time"] for r in results.values())
+
+
+def test_failed_dependency_skips_dependents():
+    rec = Recorder()
+    results, _ = _run([rec.task("a", status="FAILED"), rec.task("b", depends=["a"]),
+                       rec.task("c", depends=["b"]), rec.task("d")])
+    assert results["a"]["status"] == "FAILED"
+    assert results["b"]["status"] == "SKIPPED" and "a" in results["b"]["error"]
+    assert results["c"]["status"] == "SKIPPED" and "b" in results["c"]["error"]
+    assert results["d"]["status"] == "SUCCESS"
+    assert ("start", "b") not in rec.events and ("start", "c") not in rec.events
+
+
+def test_cycles_are_skipped_and_unknown_dependencies_ignored():
+    rec = Recorder()
+    results, messages = _run([rec.task("a", depends=["b"]), rec.task("b", depends=["a"]),
+                              rec.task("c", depends=["a"]), rec.task("d", depends=["missing"])])
+    assert results["a"]["status"] == results["b"]["status"] == "SKIPPED"
+    assert "cycle" in results["a"]["error"]
+    # c only waits for a cycle member: it is skipped because its dependency never succeeds
+    assert results["c"]["status"] == "SKIPPED"
+    assert results["d"]["status"] == "SUCCESS"
+    assert any("missing" in m for m in messages)
+
+
+def test_ready_tasks_start_in_given_order():
+    rec = Recorder()
+    _run([rec.task(name, sleep=0.01) for name in "edcba"], max_workers=1)
+    assert [name for kind, name in rec.events if kind == "start"] == list("edcba")
+
+
+def test_exclusive_task_runs_alone_in_its_scope():
+    rec = Recorder()
+    tasks = [rec.task("x1", scope="A"), rec.task("x2", scope="A"), rec.task("excl", exclusive=True, scope="A"),
+             rec.task("x3", scope="A"), rec.task("y1", scope="B", sleep=0.2)]
+    results, _ = _run(tasks, max_workers=4)
+    assert all(r["status"] == "SUCCESS" for r in results.values())
+    # Nothing else of scope A runs next to the exclusive task ...
+    at_start = rec.overlaps[[e for e in rec.events if e[0] == "start"].index(("start", "excl"))]
+    assert at_start & {"x1", "x2", "x3"} == set()
+    assert rec.position("end", "x1") < rec.position("start", "excl")
+    assert rec.position("end", "excl") < rec.position("start", "x3")
+    # ... but another scope is not held back
+    assert rec.position("start", "y1") < rec.position("start", "excl")
+    assert rec.position("end", "y1") > rec.position("start", "excl")
+
+
+def test_resource_limit_caps_concurrency():
+    rec = Recorder()
+    tasks = [rec.task(f"r{i}", resources=["big_table"]) for i in range(6)] + [rec.task("free")]
+    results, _ = _run(tasks, max_workers=6, resource_limits={"big_table": 2})
+    assert len(results) == 7
+    assert max(len(names - {"free"}) for names in rec.overlaps) == 2
@@ -0,0 +1,147 @@
+"""Statement splitting and per-statement tracking of psql output (no server needed)"""
+from test_runner import StatementTracker, _split_sql_statements
+
+
+def _texts(sql):
+    return [(s["text"], s["meta"]) for s in _split_sql_statements(sql)]
+
+
+def test_split_simple_statements_and_lines():
+    statements = _split_sql_statements("SELECT 1;\n\nSELECT\n  2;\n")
+    assert [s["text"] for s in statements] == ["SELECT 1;", "SELECT\n  2;"]
+    assert [(s["line"], s["end_line"]) for s in statements] == [(1, 1), (3, 4)]
+
+
+def test_split_ignores_semicolons_in_quotes_and_comments():
+    sql = ("SELECT 'a;b', \"x;y\" FROM t; -- trailing; comment\n"
+           "/* block; /* nested; */ still comment; */ SELECT E'it\\'s;';\n")
+    assert _texts(sql) == [("SELECT 'a;b', \"x;y\" FROM t;", False), ("SELECT E'it\\'s;';", False)]
+
+
+def test_split_dollar_quotes():
+    sql = ("CREATE FUNCTION f() RETURNS int AS $$ SELECT 1; $$ LANGUAGE sql;\n"
+           "DO $body$ BEGIN PERFORM 1; RAISE NOTICE '$$;'; END $body$;\n"
+           "SELECT $1;\n")
+    statements = _split_sql_statements(sql)
+    assert len(statements) == 3
+    assert statements[0]["text"].endswith("LANGUAGE sql;")
+    assert statements[1]["text"].startswith("DO $body$") and statements[1]["text"].endswith("$body$;")
+    # '$1' is a parameter, not the start of a dollar quote
+    assert statements[2]["text"] == "SELECT $1;"
+
+
+def test_split_parentheses_and_trailing_statement():
+    sql = "CREATE RULE r AS ON INSERT TO t DO INSTEAD (INSERT INTO u VALUES (1); INSERT INTO u VALUES (2));\nSELECT 3"
+    statements = _split_sql_statements(sql)
+    assert len(statements) == 2
+    # psql sends whatever is left in the buffer at end of file
+    assert statements[1] == {"line": 2, "end_line": 2, "text": "SELECT 3", "meta": False}
+
+
+def test_split_meta_commands():
+    sql = "\\timing on\nSELECT 1;\n\\c other\nSELECT\n\\echo inside\n2;\n"
+    assert _texts(sql) == [
+        ("\\timing on", True),
+        ("SELECT 1;", False),
+        ("\\c other", True),
+        ("\\echo inside", True),
+        # A meta-command does not end the statement around it
+        ("SELECT\n\\echo inside\n2;", False),
+    ]
+
+
+SCRIPT = """\\timing on
+CREATE TABLE t (a int);
+INSERT INTO t VALUES (1), (2);
+SELECT a FROM t ORDER BY a;
+SELECT 1/0;
+"""
+
+
+def _feed(tracker, stdout, stderr=()):
+    for line in stdout:
+        tracker("stdout", line + "\n")
+    for line in stderr:
+        tracker("stderr", line + "\n")
+
+
+def test_tracker_timing_rows_and_errors():
+    tracker = StatementTracker(_split_sql_statements(SCRIPT))
+    _feed(tracker, [
+        "Timing is on.",
+        "CREATE TABLE",
+        "Time: 1.500 ms",
+        "INSERT 0 2",
+        "Time: 0.800 ms",
+        " a ",
+        "---",
+        " 1",
+        " 2",
+        "(2 rows)",
+        "",
+        "Time: 0.300 ms",
+        "Time: 0.200 ms",  # psql prints a Time line for failed statements too
+    ], ["psql:/tmp/t.sql:5: ERROR:  division by zero"])
+    results = tracker.results
+    assert [r["index"] for r in results] == [1, 2, 3, 4]
+    assert [r["line"] for r in results] == [2, 3, 4, 5]
+    assert [r["duration"] for r in results] == [0.0015, 0.0008, 0.0003, 0.0002]
+    assert [r["rows"] for r in results] == [None, 2, 2, None]
+    assert [r["error"] for r in results] == [None, None, None, "division by zero"]
+
+
+def test_tracker_statements_that_never_ran():
+    tracker = StatementTracker(_split_sql_statements(SCRIPT))
+    _feed(tracker, ["CREATE TABLE", "Time: 1.000 ms"])
+    assert tracker.results[0]["duration"] == 0.001
+    assert all(r["duration"] is None for r in tracker.results[1:])
+
+
+def test_tracker_error_goes_to_first_statement_on_the_line():
+    tracker = StatementTracker(_split_sql_statements("SELECT 1; SELECT 1/0;\n"))
+    _feed(tracker, ["Time: 0.1 ms", "Time: 0.1 ms"], ["psql:t.sql:1: ERROR:  division by zero"])
+    # psql only reports the line, so the first statement on it takes the error
+    assert [r["error"] for r in tracker.results] == ["division by zero", None]
+
+
+def test_tracker_explain_plan_shape():
+    tracker = StatementTracker(_split_sql_statements("EXPLAIN SELECT * FROM t WHERE a = 1;\n"))
+    _feed(tracker, [
+        "                     QUERY PLAN",
+        "-----------------------------------------------------",
+        " Seq Scan on t  (cost=0.00..41.88 rows=13 width=4)",
+        "   Filter: (a = 1)",
+        "(2 rows)",
+        "",
+        "Time: 0.400 ms",
+    ])
+    result = tracker.results[0]
+    assert result["duration"] == 0.0004
+    assert "Seq Scan" in " ".join(result["plan"]["nodes"])
+    assert result["plan"]["fingerprint"]
+
+
+def _answer(sql, rows):
+    tracker = StatementTracker(_split_sql_statements(sql), answers=True)
+    _feed(tracker, [" a ", "---"] + [f" {r}" for r in rows] + [f"({len(rows)} rows)", "", "Time: 0.1 ms"])
+    (answer,) = tracker.answers()
+    return answer
+
+
+def test_answers_ignore_row_order_without_order_by():
+    first, second = _answer("SELECT a FROM t;", [1, 2, 3]), _answer("SELECT a FROM t;", [3, 1, 2])
+    assert first["hash"] == second["hash"]
+    assert first["rows"] == 3
+    assert first["lines"] == ["a", "1", "2", "3", "(3 rows)"]
+
+
+def test_answers_keep_row_order_with_order_by():
+    sql = "SELECT a FROM t ORDER BY a;"
+    assert _answer(sql, [1, 2, 3])["hash"] != _answer(sql, [3, 1, 2])["hash"]
+    # An ORDER BY inside a subquery does not order the result
+    sql = "SELECT a FROM (SELECT a FROM t ORDER BY a) s;"
+    assert _answer(sql, [1, 2, 3])["hash"] == _answer(sql, [3, 1, 2])["hash"]
+
+
+def test_answers_differ_on_values():
+    assert _answer("SELECT a FROM t;", [1, 2])["hash"] != _answer("SELECT a FROM t;", [1, 3])["hash"]